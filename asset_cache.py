@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""带内容哈希的静态资源持久化缓存
+
+站点的 /assets/index-DroxvxgR.js 一类文件名中带有内容哈希，内容永不改变。
+通过 page.route 拦截这些请求，命中时直接从磁盘返回，所有账号、所有运行共享。
+"""
+
+import os
+import re
+import time
+import hashlib
+
+from statefile import write_atomic, write_json, read_json
+
+# 文件名中带 8 位以上内容哈希的静态资源，例如 /assets/semi-ui-_MEBl3Ck.js
+HASHED_ASSET_RE = re.compile(
+    r'/assets/[^/?#]+-[A-Za-z0-9_-]{8,}\.(?:js|mjs|css|woff2?|ttf|png|jpe?g|gif|svg|webp)(?:\?[^#]*)?$'
+)
+
+# 回放时保留的响应头，其余（content-encoding、content-length 等）由浏览器重新计算
+KEPT_HEADERS = ('content-type',)
+
+INDEX_FILE = 'index.json'
+
+
+class AssetCache:
+    """按 URL 缓存不可变静态资源，超出容量时按最近访问时间（LRU）淘汰"""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.bytes_served = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    @classmethod
+    def from_env(cls):
+        """根据 ASSET_CACHE_DIR / ASSET_CACHE_MAX_MB 创建缓存，未配置目录时返回 None"""
+        cache_dir = os.environ.get('ASSET_CACHE_DIR')
+        if not cache_dir:
+            return None
+        max_mb = float(os.environ.get('ASSET_CACHE_MAX_MB') or '200')
+        return cls(cache_dir, int(max_mb * 1024 * 1024))
+
+    @staticmethod
+    def is_cacheable(url):
+        """只缓存带内容哈希的静态资源"""
+        return HASHED_ASSET_RE.search(url) is not None
+
+    @property
+    def total_bytes(self):
+        return sum(entry['size'] for entry in self._index.values())
+
+    @property
+    def hit_rate(self):
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def stats(self):
+        """缓存统计信息"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'bytes_served': self.bytes_served,
+            'evicted': self.evicted,
+            'entries': len(self._index),
+            'total_bytes': self.total_bytes,
+        }
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.bin")
+
+    def _load_index(self):
+        """读取索引，并清理索引中不存在的孤立文件"""
+        index = read_json(os.path.join(self.cache_dir, INDEX_FILE)) or {}
+        index = {
+            key: entry for key, entry in index.items()
+            if os.path.exists(self._path(key))
+        }
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.bin') and name[:-4] not in index:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+        return index
+
+    def save(self):
+        """原子写入索引文件"""
+        write_json(os.path.join(self.cache_dir, INDEX_FILE), self._index)
+
+    def get(self, url):
+        """读取缓存，返回 (headers, body)，未命中返回 None"""
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                body = f.read()
+        except OSError:
+            self._index.pop(key, None)
+            return None
+        entry['atime'] = time.time()
+        return entry['headers'], body
+
+    def put(self, url, headers, body):
+        """写入缓存，并在超出容量时淘汰最久未访问的条目"""
+        if len(body) > self.max_bytes:
+            return
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        write_atomic(self._path(key), body)
+
+        self._index[key] = {
+            'url': url,
+            'size': len(body),
+            'headers': {k: v for k, v in headers.items() if k.lower() in KEPT_HEADERS},
+            'atime': time.time(),
+        }
+        self._evict()
+
+    def _evict(self):
+        total = self.total_bytes
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]['atime']):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            del self._index[key]
+            total -= entry['size']
+            self.evicted += 1
+
+    async def attach(self, page, on_hit=None):
+        """在页面上注册路由拦截；on_hit(url) 在从磁盘返回响应时调用"""
+        async def handler(route):
+            await self._handle_route(route, on_hit)
+
+        await page.route(HASHED_ASSET_RE, handler)
+
+    async def _handle_route(self, route, on_hit=None):
+        url = route.request.url
+        if route.request.method != 'GET':
+            await route.continue_()
+            return
+
+        cached = self.get(url)
+        if cached is not None:
+            headers, body = cached
+            self.hits += 1
+            self.bytes_served += len(body)
+            if on_hit:
+                on_hit(url)
+            await route.fulfill(status=200, headers=headers, body=body)
+            return
+
+        self.misses += 1
+        try:
+            response = await route.fetch()
+        except Exception:
+            try:
+                await route.continue_()
+            except Exception:
+                pass
+            return
+
+        if response.status != 200:
+            await route.fulfill(response=response)
+            return
+
+        body = await response.body()
+        self.put(url, response.headers, body)
+        headers = {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS}
+        await route.fulfill(status=200, headers=headers, body=body)
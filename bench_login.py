@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""登录流程离线基准测试
+
+用 snapshots/ 下保存的登录页快照（邮箱登录切换、已是邮箱登录、凭据错误、挑战页、维护页等）
+代替真实网站，通过 page.route 在本地页面中回放，对每个场景执行一次 AnyrouteCheckin._try_login_once()。
+输出每个登录步骤的耗时、与浏览器的往返次数以及其中的固定等待时间，不需要网络，几十秒内即可完成。
+
+手写快照模拟的是已知的页面结构；--capture 打开真实登录页，把加载过程中同源的 HTML、JS、CSS
+和接口响应录制到 snapshots/live/，live_* 场景在本地运行网站自己的前端代码，网站改版后重新录制即可发现选择器失效。
+
+用法:
+    python bench_login.py                       # 运行全部场景
+    python bench_login.py -k toggle -n 3        # 只运行名称包含 toggle 的场景，重复 3 次取中位数
+    python bench_login.py --json result.json    # 保存结果
+    python bench_login.py --baseline result.json --tolerance 0.2
+                                                # 与之前的结果对比，耗时变慢超过 20% 或往返次数增加时失败
+    python bench_login.py --loop-monitor        # 同时监控事件循环延迟（LOOP_LAG_FAIL_MS 设置失败阈值）
+    python bench_login.py --capture             # 录制真实登录页（ANYROUTE_BASE_URL）到 snapshots/live/
+
+任何场景的登录结果与预期不符时以非零退出码结束。
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import inspect
+import argparse
+import shutil
+import statistics
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import urlparse
+
+# 挑战页宽限与表单等待按本地回放的速度缩短，显式设置时以环境变量为准
+os.environ.setdefault('CHALLENGE_GRACE', '1')
+os.environ.setdefault('LOGIN_FORM_TIMEOUT', '5')
+
+from checkin import AnyrouteCheckin, camoufox_options, classify_page, PAGE_SNAPSHOT_JS
+from loopmon import LoopMonitor
+from logs import setup_logging, shutdown_logging
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots')
+CAPTURE_DIR = os.path.join(SNAPSHOT_DIR, 'live')
+CAPTURE_MANIFEST = os.path.join(CAPTURE_DIR, 'manifest.json')
+
+# 回放使用的站点地址，所有请求都由 page.route 拦截，不会产生真实网络请求
+BENCH_BASE_URL = 'https://anyrouter.bench'
+
+LOGIN_OK = {'success': True, 'message': '', 'data': {'id': 10001, 'username': 'bench', 'display_name': 'bench'}}
+LOGIN_BAD = {'success': False, 'message': '用户名或密码错误，或用户已被封禁'}
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+}
+
+
+@dataclass
+class Scenario:
+    """一个登录页状态及其预期结果"""
+    name: str
+    # /login 依次返回的快照，最后一个重复使用（用于模拟挑战页验证通过后刷新）
+    pages: list
+    status: int = 200
+    login_response: dict = field(default_factory=lambda: LOGIN_OK)
+    expect_login: bool = True
+    expect_failure: Optional[str] = None
+    # 使用 --capture 录制的真实页面及其静态资源，而不是 pages 中的手写快照
+    capture: bool = False
+
+
+SCENARIOS = [
+    Scenario('toggle_success', ['login_toggle.html']),
+    Scenario('form_success', ['login_form.html']),
+    Scenario('bad_credentials', ['login_form.html'], login_response=LOGIN_BAD,
+             expect_login=False, expect_failure='credentials'),
+    Scenario('challenge_resolves', ['acw_challenge.html', 'login_toggle.html']),
+    Scenario('challenge', ['challenge.html'], expect_login=False, expect_failure='challenge'),
+    Scenario('maintenance', ['maintenance.html'], status=503, expect_login=False, expect_failure='maintenance'),
+    Scenario('gateway_error', ['gateway_error.html'], status=502, expect_login=False, expect_failure='unavailable'),
+    Scenario('live_success', [], capture=True),
+    Scenario('live_bad_credentials', [], capture=True, login_response=LOGIN_BAD,
+             expect_login=False, expect_failure='credentials'),
+]
+
+
+def read_snapshot(name, directory=SNAPSHOT_DIR):
+    with open(os.path.join(directory, name), 'rb') as f:
+        return f.read()
+
+
+def load_capture():
+    """读取 --capture 录制的清单，未录制时返回 None"""
+    try:
+        with open(CAPTURE_MANIFEST, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except OSError:
+        return None
+
+
+class SnapshotServer:
+    """page.route 处理函数：按场景返回快照和登录接口响应，其余请求返回 404"""
+
+    def __init__(self, scenario, capture=None):
+        self.scenario = scenario
+        self.capture = capture
+        self.login_loads = 0
+
+    async def handle(self, route):
+        path = urlparse(route.request.url).path
+        if self.scenario.capture and path != '/api/user/login':
+            await self._serve_capture(route, path)
+        elif path == '/login':
+            pages = self.scenario.pages
+            name = pages[min(self.login_loads, len(pages) - 1)]
+            self.login_loads += 1
+            await route.fulfill(status=self.scenario.status, headers={'content-type': CONTENT_TYPES['.html']},
+                                body=read_snapshot(name))
+        elif path == '/console':
+            await route.fulfill(status=200, headers={'content-type': CONTENT_TYPES['.html']},
+                                body=read_snapshot('console.html'))
+        elif path.startswith('/static/'):
+            name = os.path.basename(path)
+            await route.fulfill(status=200, headers={'content-type': CONTENT_TYPES[os.path.splitext(name)[1]]},
+                                body=read_snapshot(name))
+        elif path == '/api/user/login':
+            await route.fulfill(status=200, headers={'content-type': 'application/json'},
+                                body=json.dumps(self.scenario.login_response, ensure_ascii=False))
+        else:
+            await route.fulfill(status=404, body='')
+
+    async def _serve_capture(self, route, path):
+        """返回录制的响应；未录制的页面导航按单页应用返回登录页 HTML，其余请求返回 404"""
+        responses = self.capture['responses']
+        entry = responses.get(path)
+        if entry is None and route.request.resource_type == 'document':
+            entry = responses['/login']
+        if entry is None:
+            await route.fulfill(status=404, body='')
+            return
+        await route.fulfill(status=entry['status'], headers={'content-type': entry['content_type']},
+                            body=read_snapshot(entry['file'], CAPTURE_DIR))
+
+
+class RoundTripCounter:
+    """包装 Page / ElementHandle / Keyboard，按当前登录步骤统计与浏览器的往返次数
+
+    Playwright 异步 API 的每次 await 调用都是一次与浏览器进程的往返；
+    wait_for_timeout 的时长另外计入固定等待。
+    """
+
+    def __init__(self, target, checkin, stats):
+        self._target = target
+        self._checkin = checkin
+        self._stats = stats
+
+    def _wrap(self, value):
+        if type(value).__name__ == 'ElementHandle':
+            return RoundTripCounter(value, self._checkin, self._stats)
+        if isinstance(value, list):
+            return [self._wrap(item) for item in value]
+        return value
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name in ('keyboard', 'mouse'):
+            return RoundTripCounter(attr, self._checkin, self._stats)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            # 登录步骤之外的调用（创建、关闭页面）不计入
+            if self._checkin.current_step is not None:
+                step = self._stats.setdefault(self._checkin.current_step, {'round_trips': 0, 'wait_ms': 0})
+                step['round_trips'] += 1
+                if name == 'wait_for_timeout':
+                    step['wait_ms'] += args[0] if args else kwargs.get('timeout', 0)
+            return self._wrap(await attr(*args, **kwargs))
+
+        return call
+
+
+class BenchCheckin(AnyrouteCheckin):
+    """在共享浏览器的独立上下文中回放快照"""
+
+    def __init__(self, scenario, browser, capture=None):
+        super().__init__(
+            email='bench', password='bench-password', base_url=BENCH_BASE_URL,
+            headless=True, account_name=scenario.name, browser=browser,
+        )
+        self.server = SnapshotServer(scenario, capture)
+        self.round_trips = {}
+
+    async def _init_browser(self):
+        await super()._init_browser()
+        await self.page.route('**/*', self.server.handle)
+        self.page = RoundTripCounter(self.page, self, self.round_trips)
+
+
+async def run_scenario(browser, scenario, capture=None):
+    """执行一次场景，返回结果字典"""
+    checkin = BenchCheckin(scenario, browser, capture)
+    try:
+        await checkin._init_browser()
+        started = time.perf_counter()
+        logged_in = await checkin._try_login_once()
+        total = time.perf_counter() - started
+    finally:
+        await checkin._close_browser()
+
+    steps = {}
+    for name, seconds in checkin.step_timings:
+        step = steps.setdefault(name, {'ms': 0.0, 'round_trips': 0, 'wait_ms': 0})
+        step['ms'] += seconds * 1000
+    for name, counted in checkin.round_trips.items():
+        step = steps.setdefault(name, {'ms': 0.0, 'round_trips': 0, 'wait_ms': 0})
+        step['round_trips'] += counted['round_trips']
+        step['wait_ms'] += counted['wait_ms']
+
+    passed = logged_in == scenario.expect_login and (
+        scenario.expect_failure is None or checkin.failure == scenario.expect_failure)
+    return {
+        'name': scenario.name,
+        'passed': passed,
+        'logged_in': logged_in,
+        'failure': checkin.failure,
+        'total_ms': total * 1000,
+        'round_trips': sum(step['round_trips'] for step in steps.values()),
+        'steps': steps,
+    }
+
+
+def merge_runs(runs):
+    """多次运行取耗时中位数；往返次数和固定等待取最后一次"""
+    result = dict(runs[-1])
+    result['passed'] = all(run['passed'] for run in runs)
+    result['total_ms'] = statistics.median(run['total_ms'] for run in runs)
+    result['steps'] = {
+        name: {**step, 'ms': statistics.median(run['steps'].get(name, {}).get('ms', 0.0) for run in runs)}
+        for name, step in runs[-1]['steps'].items()
+    }
+    return result
+
+
+def print_result(result):
+    outcome = '[OK]' if result['passed'] else '[FAIL]'
+    login_text = '登录成功' if result['logged_in'] else f"登录失败 ({result['failure'] or '未知'})"
+    print(f"\n{outcome} {result['name']}: {login_text}  总耗时 {result['total_ms']:.0f}ms  "
+          f"往返 {result['round_trips']} 次")
+    # 中文字符按两列宽度对齐
+    print(f"    {'步骤':<16}{'耗时(ms)':>8}{'往返':>6}{'固定等待(ms)':>10}")
+    for name, step in result['steps'].items():
+        print(f"    {name:<18}{step['ms']:>10.0f}{step['round_trips']:>8}{step['wait_ms']:>14.0f}")
+
+
+def compare_baseline(results, baseline, tolerance):
+    """与基线对比，返回回归描述列表"""
+    regressions = []
+    previous = {item['name']: item for item in baseline}
+    for result in results:
+        base = previous.get(result['name'])
+        if not base:
+            continue
+        if result['total_ms'] > base['total_ms'] * (1 + tolerance):
+            regressions.append(f"{result['name']}: 耗时 {base['total_ms']:.0f}ms -> {result['total_ms']:.0f}ms")
+        if result['round_trips'] > base['round_trips']:
+            regressions.append(f"{result['name']}: 往返 {base['round_trips']} -> {result['round_trips']} 次")
+    return regressions
+
+
+def capture_file_name(path, content_type):
+    """录制文件名：URL 路径中的 / 替换为 _，HTML 补上扩展名"""
+    name = path.strip('/').replace('/', '_') or 'index'
+    if 'html' in content_type and not name.endswith('.html'):
+        name += '.html'
+    return name
+
+
+async def capture_site(base_url):
+    """打开真实登录页，录制同源的 GET 响应及切换到邮箱登录后渲染出的 DOM
+
+    页面未显示登录表单（挑战页、维护页）时不覆盖已有录制，返回 False
+    """
+    from camoufox.async_api import AsyncCamoufox
+
+    host = urlparse(base_url).netloc
+    responses = []
+    async with AsyncCamoufox(**camoufox_options(True)) as browser:
+        context = await browser.new_context()
+        page = await context.new_page()
+        page.on('response', responses.append)
+
+        response = await page.goto(f"{base_url}/login", wait_until='networkidle', timeout=60000)
+        state = classify_page(await page.evaluate(PAGE_SNAPSHOT_JS), response.status if response else None)
+        if state != 'form':
+            print(f"[FAIL] 登录页未显示登录表单（{state}），未更新录制")
+            await context.close()
+            return False
+
+        # 切换到邮箱登录，录制按需加载的代码块
+        email_btn = await page.query_selector('text=/.*邮箱.*登.*/')
+        if email_btn:
+            await email_btn.click()
+            await page.wait_for_load_state('networkidle')
+        rendered = await page.evaluate('() => document.documentElement.outerHTML')
+
+        recorded = {}
+        for item in responses:
+            url = urlparse(item.url)
+            if url.netloc != host or item.request.method != 'GET' or not 200 <= item.status < 300:
+                continue
+            try:
+                body = await item.body()
+            except Exception:
+                continue
+            content_type = item.headers.get('content-type', 'application/octet-stream')
+            recorded[url.path] = (item.status, content_type, body)
+        await context.close()
+
+    if '/login' not in recorded:
+        print("[FAIL] 未录制到登录页 HTML，未更新录制")
+        return False
+
+    shutil.rmtree(CAPTURE_DIR, ignore_errors=True)
+    os.makedirs(CAPTURE_DIR)
+    manifest = {'base_url': base_url, 'captured_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'responses': {}}
+    for path, (status, content_type, body) in sorted(recorded.items()):
+        name = capture_file_name(path, content_type)
+        with open(os.path.join(CAPTURE_DIR, name), 'wb') as f:
+            f.write(body)
+        manifest['responses'][path] = {'status': status, 'content_type': content_type, 'file': name}
+    # 渲染后的 DOM 只用于在 diff 中查看页面结构变化，回放时不使用
+    with open(os.path.join(CAPTURE_DIR, 'rendered.html'), 'w', encoding='utf-8') as f:
+        f.write(rendered)
+    with open(CAPTURE_MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    print(f"[OK] 已录制 {len(recorded)} 个响应到 {CAPTURE_DIR}")
+    return True
+
+
+async def run_bench(scenarios, repeat, loop_monitor=None, capture=None):
+    from camoufox.async_api import AsyncCamoufox
+
+    if loop_monitor:
+        loop_monitor.start()
+    results = []
+    async with AsyncCamoufox(**camoufox_options(True)) as browser:
+        for scenario in scenarios:
+            runs = [await run_scenario(browser, scenario, capture) for _ in range(repeat)]
+            result = merge_runs(runs)
+            print_result(result)
+            results.append(result)
+    if loop_monitor:
+        await loop_monitor.stop()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='登录流程离线基准测试')
+    parser.add_argument('-k', dest='keyword', help='只运行名称包含该关键字的场景')
+    parser.add_argument('-n', '--repeat', type=int, default=1, help='每个场景的重复次数，耗时取中位数')
+    parser.add_argument('--json', dest='json_path', help='结果写入该 JSON 文件')
+    parser.add_argument('--baseline', help='与之前保存的 JSON 结果对比')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的耗时增幅（默认 0.2，即 20%%）')
+    parser.add_argument('--loop-monitor', action='store_true', help='同时监控事件循环延迟')
+    parser.add_argument('--capture', action='store_true',
+                        help='录制真实登录页（ANYROUTE_BASE_URL）到 snapshots/live/ 后退出')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    # 签到脚本自身的日志只保留警告以上，报告直接输出
+    setup_logging(level=os.environ.get('LOG_LEVEL') or 'WARNING')
+
+    if args.capture:
+        base_url = (os.environ.get('ANYROUTE_BASE_URL') or 'https://anyrouter.top').rstrip('/')
+        ok = asyncio.run(capture_site(base_url))
+        shutdown_logging()
+        sys.exit(0 if ok else 1)
+
+    scenarios = [s for s in SCENARIOS if not args.keyword or args.keyword in s.name]
+    capture = load_capture()
+    if capture is None and any(s.capture for s in scenarios):
+        print("[SKIP] snapshots/live/ 中没有录制，跳过 live_* 场景（先运行 --capture）")
+        scenarios = [s for s in scenarios if not s.capture]
+    loop_monitor = None
+    if args.loop_monitor:
+        loop_monitor = LoopMonitor(
+            threshold=float(os.environ.get('LOOP_LAG_THRESHOLD_MS') or '100') / 1000,
+            fail_threshold=float(os.environ.get('LOOP_LAG_FAIL_MS') or '0') / 1000,
+        )
+
+    results = asyncio.run(run_bench(scenarios, max(args.repeat, 1), loop_monitor, capture))
+    ok = all(result['passed'] for result in results)
+
+    if loop_monitor:
+        print()
+        loop_monitor.report(print)
+        ok = ok and not loop_monitor.exceeded()
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\n[FAIL] 与基线相比出现回归:")
+            for line in regressions:
+                print(f"  - {line}")
+            ok = False
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print(f"\n{sum(r['passed'] for r in results)}/{len(results)} 个场景符合预期")
+    shutdown_logging()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
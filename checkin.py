@@ -1,28 +1,109 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import time
+
+# 启动计时从加载任何其他模块之前开始，导入耗时计入启动时间
+_STARTUP_T0 = time.perf_counter()
+
 import gc
 import os
 import sys
 import json
 import asyncio
-import smtplib
-import requests
+import logging
+import argparse
 from datetime import datetime
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.header import Header
-from camoufox.async_api import AsyncCamoufox
-
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from asset_cache import AssetCache
+from metrics import CheckinMetrics
+from netstats import NetworkAccounting
+from notify import Notifier
+from loopmon import LoopMonitor
+from profiles import ProfileStore, profile_key
+from quarantine import CredentialQuarantine, account_key
+from logs import log, echo, debug_enabled, account_context, setup_logging, shutdown_logging
+
+# 重量级依赖（camoufox、requests、smtplib、email.mime）均在使用处延迟导入，
+# 无账号或无需处理账号的运行可以快速退出
+
+# 签到结果状态对应的显示文本
+STATUS_TEXT = {
+    'success': '[OK] 成功',
+    'failed': '[FAIL] 失败',
+    'timeout': '[FAIL] 超时',
+    'deferred': '[SKIP] 已推迟',
+    'quarantined': '[SKIP] 凭据错误，已隔离',
+    'challenge': '[FAIL] 遇到人机验证',
+    'maintenance': '[FAIL] 网站维护中',
+}
+
+# 未执行登录而跳过的状态，对应指标中的 reason 标签
+SKIP_REASONS = {
+    'deferred': 'deferred',
+    'quarantined': 'quarantine',
+}
+
+
+def report_startup_time(stage):
+    """记录从脚本加载到当前阶段的耗时，超出 STARTUP_BUDGET_MS 时告警
+
+    返回是否在预算之内
+    """
+    elapsed_ms = (time.perf_counter() - _STARTUP_T0) * 1000
+    budget_ms = float(os.environ.get('STARTUP_BUDGET_MS') or '300')
+
+    if elapsed_ms > budget_ms:
+        log(f"[WARN] 启动耗时 {elapsed_ms:.1f}ms 超出预算 {budget_ms:.0f}ms ({stage})")
+    else:
+        log(f"启动耗时 {elapsed_ms:.1f}ms ({stage})")
+    return elapsed_ms <= budget_ms
+
+
+def check_camoufox_ready():
+    """检查 Camoufox 浏览器及指纹资源是否已就绪（不会触发下载）
+
+    返回 (是否就绪, 说明)
+    """
+    try:
+        from camoufox.pkgman import camoufox_path, installed_verstr, LAUNCH_FILE, OS_NAME
+        from camoufox.addons import DefaultAddons
+    except ImportError as e:
+        return False, f"camoufox 未安装或版本不兼容: {e}"
 
-def log(message):
-    """打印带时间戳的日志"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     try:
-        print(f"[{timestamp}] {message}")
-    except UnicodeEncodeError:
-        safe_msg = message.replace('✓', '[OK]').replace('✗', '[FAIL]')
-        print(f"[{timestamp}] {safe_msg}")
+        install_dir = camoufox_path(download_if_missing=False)
+        version = installed_verstr()
+    except Exception as e:
+        return False, f"Camoufox 浏览器未下载: {e}"
+
+    executable = install_dir / LAUNCH_FILE[OS_NAME]
+    if not executable.exists():
+        return False, f"Camoufox 可执行文件不存在: {executable}"
+
+    # 默认插件随 camoufox fetch 一起下载；geoip=False，因此不检查 GeoIP 数据库
+    for addon in DefaultAddons:
+        addon_dir = install_dir / 'addons' / addon.name
+        if not addon_dir.exists():
+            return False, f"Camoufox 插件缺失: {addon_dir}"
+
+    return True, f"Camoufox {version} 已就绪: {install_dir}"
+
+
+def warmup():
+    """--warmup 入口：资源就绪返回 True，否则需要执行 camoufox fetch
+
+    启动耗时在检查前记录，检查本身需要导入 camoufox，不属于正常启动路径
+    """
+    report_startup_time('warmup')
+    ready, detail = check_camoufox_ready()
+    if ready:
+        log(f"[OK] {detail}")
+    else:
+        log(f"[WARN] {detail}")
+    return ready
 
 
 def check_today_success():
@@ -36,6 +117,8 @@ def check_today_success():
         return False
 
     try:
+        import requests
+
         today = datetime.now().strftime('%Y-%m-%d')
 
         # 使用 GitHub API 获取 repository variable
@@ -80,6 +163,8 @@ def update_success_date():
         return False
 
     try:
+        import requests
+
         today = datetime.now().strftime('%Y-%m-%d')
 
         # 检查 variable 是否存在
@@ -129,8 +214,8 @@ def update_success_date():
         return False
 
 
-def send_email(results):
-    """发送签到结果邮件通知"""
+def send_email(subject, html_body, attachments=()):
+    """发送邮件通知；attachments 为 [(文件名, bytes, MIME 子类型)]"""
     # 读取邮件配置
     smtp_server = os.environ.get('SMTP_SERVER')
     smtp_port = int(os.environ.get('SMTP_PORT') or '587')
@@ -138,85 +223,25 @@ def send_email(results):
     smtp_password = os.environ.get('SMTP_PASSWORD')
     email_to = os.environ.get('EMAIL_TO')
 
-    # 如果没有配置邮件，则跳过
-    if not all([smtp_server, smtp_user, smtp_password, email_to]):
-        log("未配置邮件发送，跳过邮件通知")
-        return False
-
     try:
-        # 统计结果
-        success_count = sum(1 for r in results if r['success'])
-        fail_count = len(results) - success_count
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-        # 构建邮件内容
-        subject = f"Anyrouter 签到报告 - {current_time}"
-
-        # HTML 邮件正文
-        html_body = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; }}
-                .summary {{ background-color: #f0f0f0; padding: 15px; border-radius: 5px; margin: 10px 0; }}
-                .success {{ color: #28a745; }}
-                .fail {{ color: #dc3545; }}
-                table {{ border-collapse: collapse; width: 100%; margin: 20px 0; }}
-                th, td {{ border: 1px solid #ddd; padding: 12px; text-align: left; }}
-                th {{ background-color: #4CAF50; color: white; }}
-                tr:nth-child(even) {{ background-color: #f2f2f2; }}
-            </style>
-        </head>
-        <body>
-            <h2>Anyrouter 自动签到报告</h2>
-            <div class="summary">
-                <p><strong>执行时间：</strong>{current_time}</p>
-                <p><strong>总计账号：</strong>{len(results)} 个</p>
-                <p class="success"><strong>✓ 成功：</strong>{success_count} 个</p>
-                <p class="fail"><strong>✗ 失败：</strong>{fail_count} 个</p>
-            </div>
-
-            <h3>详细结果</h3>
-            <table>
-                <tr>
-                    <th>账号名称</th>
-                    <th>签到结果</th>
-                    <th>账户余额</th>
-                </tr>
-        """
-
-        for result in results:
-            status_color = "success" if result['success'] else "fail"
-            status_text = "✓ 成功" if result['success'] else "✗ 失败"
-            quota_info = result.get('quota_info', '')
-
-            html_body += f"""
-                <tr>
-                    <td>{result['name']}</td>
-                    <td class="{status_color}">{status_text}</td>
-                    <td>{quota_info}</td>
-                </tr>
-            """
-
-        html_body += """
-            </table>
-            <hr>
-            <p style="color: #666; font-size: 12px;">
-                此邮件由 Anyrouter 自动签到脚本自动发送
-            </p>
-        </body>
-        </html>
-        """
+        import smtplib
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.application import MIMEApplication
+        from email.header import Header
 
         # 创建邮件
-        message = MIMEMultipart('alternative')
+        message = MIMEMultipart('mixed')
         message['From'] = Header(f"Anyrouter 签到 <{smtp_user}>", 'utf-8')
         message['To'] = Header(email_to, 'utf-8')
         message['Subject'] = Header(subject, 'utf-8')
 
-        # 添加 HTML 内容
-        html_part = MIMEText(html_body, 'html', 'utf-8')
-        message.attach(html_part)
+        # 添加 HTML 内容和附件
+        message.attach(MIMEText(html_body, 'html', 'utf-8'))
+        for filename, data, subtype in attachments:
+            part = MIMEApplication(data, _subtype=subtype)
+            part.add_header('Content-Disposition', 'attachment', filename=filename)
+            message.attach(part)
 
         # 发送邮件
         log(f"正在发送邮件到 {email_to}...")
@@ -242,8 +267,220 @@ def send_email(results):
         return False
 
 
+def email_configured():
+    """是否配置了邮件发送"""
+    return all(os.environ.get(name) for name in ('SMTP_SERVER', 'SMTP_USER', 'SMTP_PASSWORD', 'EMAIL_TO'))
+
+
+def notify(notifier, results):
+    """按通知模式发送邮件；未配置邮件时只更新通知状态"""
+    messages = notifier.prepare(results)
+    if not email_configured():
+        log("未配置邮件发送，跳过邮件通知")
+        notifier.finish(delivered=True)
+        return False
+    if not messages:
+        log(f"通知模式 {notifier.mode}：本次没有需要发送的内容")
+        notifier.finish(delivered=True)
+        return False
+
+    delivered = all([send_email(*message) for message in messages])
+    notifier.finish(delivered)
+    return delivered
+
+
+def camoufox_options(headless):
+    """AsyncCamoufox 启动参数"""
+    return {
+        'headless': headless,
+        'humanize': True,
+        'locale': 'zh-CN',
+        'geoip': False,
+    }
+
+
+# 登录错误提示中表示凭据错误的关键字（小写比较）
+CREDENTIAL_ERROR_PATTERNS = (
+    '用户名或密码',
+    '账号或密码',
+    '密码错误',
+    '密码不正确',
+    '用户不存在',
+    '账号不存在',
+    '已被封禁',
+    'invalid username',
+    'invalid credentials',
+    'incorrect password',
+    'wrong password',
+    'password is incorrect',
+)
+
+
+def is_credential_error(message):
+    """页面错误提示是否表示账号或密码错误"""
+    message = message.lower()
+    return any(pattern in message for pattern in CREDENTIAL_ERROR_PATTERNS)
+
+
+# 页面上的提示文本；公告、横幅等提交前已存在的提示不代表登录结果，需与提交前的文本对比
+ALERT_TEXTS_JS = '''() => {
+    const texts = [];
+    for (const el of document.querySelectorAll('.error, .alert, [role="alert"], .toast, .message')) {
+        const text = (el.innerText || '').trim();
+        if (text && text.length < 200) texts.push(text);
+    }
+    return texts;
+}'''
+
+# 登录页面快照：一次 evaluate 取得判断页面状态所需的全部信息
+PAGE_SNAPSHOT_JS = '''() => {
+    const body = document.body ? document.body.innerText || '' : '';
+    let emailToggle = false;
+    for (const el of document.querySelectorAll('span, div, a, button, p')) {
+        const text = el.innerText || '';
+        if (text.length < 50 && text.includes('邮箱') && text.includes('登')) {
+            emailToggle = true;
+            break;
+        }
+    }
+    return {
+        title: document.title || '',
+        text: body.slice(0, 2000),
+        html: document.documentElement ? document.documentElement.outerHTML.slice(0, 20000) : '',
+        hasForm: !!document.querySelector('input#username, input#password, input[type="password"]'),
+        emailToggle: emailToggle,
+        readyState: document.readyState
+    };
+}'''
+
+# 人机验证 / 反爬挑战页面的特征（标题、正文或 HTML 中出现，小写比较）
+CHALLENGE_MARKERS = (
+    'just a moment',
+    'attention required',
+    'checking your browser',
+    'cf-challenge',
+    'challenge-platform',
+    'challenges.cloudflare.com',
+    'ddos-guard',
+    'acw_sc__v2',
+    '人机验证',
+    '安全验证',
+    '请完成验证',
+)
+
+# 维护 / 服务不可用页面的特征：网站明确处于维护状态，重试没有意义
+MAINTENANCE_MARKERS = (
+    '维护中',
+    '系统维护',
+    '正在维护',
+    'under maintenance',
+    'maintenance mode',
+    'service unavailable',
+)
+
+# 网关错误页面的特征：通常是短暂故障，按普通失败重试
+GATEWAY_ERROR_MARKERS = (
+    'bad gateway',
+    'gateway time-out',
+    'gateway timeout',
+)
+
+# 单独出现即可判定为维护中 / 网关错误的 HTTP 状态码
+MAINTENANCE_STATUS = (503,)
+GATEWAY_ERROR_STATUS = (502, 504)
+
+
+def classify_page(snapshot, http_status=None):
+    """根据页面快照判断登录页状态：'form' / 'challenge' / 'maintenance' / 'unavailable' / 'loading'
+
+    登录表单或邮箱登录入口已出现时总是返回 'form'（登录页内嵌的 Turnstile 不算挑战页）。
+    'unavailable' 为 502/504 等网关错误，可能只是短暂故障。
+    """
+    if snapshot.get('hasForm') or snapshot.get('emailToggle'):
+        return 'form'
+
+    title = snapshot.get('title', '').lower()
+    text = snapshot.get('text', '').lower()
+    html = snapshot.get('html', '').lower()
+
+    if any(marker in title or marker in html for marker in CHALLENGE_MARKERS):
+        return 'challenge'
+    if any(marker in title or marker in text for marker in MAINTENANCE_MARKERS):
+        return 'maintenance'
+    if any(marker in title or marker in text for marker in GATEWAY_ERROR_MARKERS):
+        return 'unavailable'
+    if http_status in MAINTENANCE_STATUS:
+        return 'maintenance'
+    if http_status in GATEWAY_ERROR_STATUS:
+        return 'unavailable'
+    return 'loading'
+
+
+# 页面内可调用的接口：名称 -> (方法, 路径)
+API_ENDPOINTS = {
+    'sign_in': ('POST', '/api/user/sign_in'),
+    'user_info': ('GET', '/api/user/self'),
+    'status': ('GET', '/api/status'),
+    'notice': ('GET', '/api/notice'),
+    'tokens': ('GET', '/api/token/?p=0&size=10'),
+}
+
+# 在页面内并发执行一批 fetch，返回每个调用的状态码、JSON 数据和耗时
+API_BATCH_JS = '''async (calls) => {
+    return await Promise.all(calls.map(async (call) => {
+        const started = performance.now();
+        try {
+            const response = await fetch(call.url, {
+                method: call.method,
+                headers: call.headers,
+                credentials: 'same-origin'
+            });
+            const text = await response.text();
+            let data = null;
+            try {
+                data = JSON.parse(text);
+            } catch (e) {
+                data = null;
+            }
+            return {name: call.name, status: response.status, data: data, error: null,
+                    elapsed: performance.now() - started};
+        } catch (e) {
+            return {name: call.name, status: null, data: null, error: e.message,
+                    elapsed: performance.now() - started};
+        }
+    }));
+}'''
+
+
+@dataclass
+class ApiResult:
+    """页面内接口调用的结果"""
+    name: str
+    status: Optional[int]
+    data: Any
+    error: Optional[str]
+    elapsed_ms: float
+
+    @classmethod
+    def from_raw(cls, raw):
+        return cls(
+            name=raw['name'],
+            status=raw.get('status'),
+            data=raw.get('data'),
+            error=raw.get('error'),
+            elapsed_ms=raw.get('elapsed') or 0.0
+        )
+
+    @property
+    def ok(self):
+        """HTTP 2xx 且接口返回 success=true"""
+        return (self.status is not None and 200 <= self.status < 300
+                and isinstance(self.data, dict) and self.data.get('success') is True)
+
+
 class AnyrouteCheckin:
-    def __init__(self, email, password, base_url=None, headless=True, account_name=None):
+    def __init__(self, email, password, base_url=None, headless=True, account_name=None,
+                 asset_cache=None, metrics=None, browser=None, extra_api=None, profile=None):
         self.email = email
         self.password = password
         self.base_url = base_url or os.environ.get('ANYROUTE_BASE_URL', 'https://anyrouter.top')
@@ -251,26 +488,146 @@ class AnyrouteCheckin:
         self.headless = headless
         self.page = None
         self.browser = None
+        # 由 CheckinSession 共享的浏览器；为 None 时自行启动并在结束时关闭
+        self.shared_browser = browser
+        self.context = None
+        self._camoufox = None
         self.account_name = account_name or email
+        self.asset_cache = asset_cache
+        self.metrics = metrics
+        # 失败类型：'login' / 'credentials' / 'challenge' / 'maintenance' / 'sign_in'，成功时为 None；
+        # 单次登录尝试遇到网关错误时为 'unavailable'，重试后仍然如此则改为 'maintenance'
+        self.failure = None
+        # 登录页面的错误提示
+        self.login_error = None
+        # 签到时一并调用的额外接口（API_ENDPOINTS 中的名称），结果保存在 api_results
+        self.extra_api = list(extra_api or [])
+        self.api_results = {}
+        # 页面流量统计
+        self.network = None
+        # 持久化浏览器配置（登录状态与固定指纹），为 None 时每次都是全新的浏览器
+        self.profile = profile
+        # 是否通过保存的登录状态跳过了登录表单
+        self.session_restored = False
+        self.logged_in = False
+        # 登录各步骤的耗时 [(步骤, 秒)]，供基准测试（bench_login.py）和调试使用
+        self.step_timings = []
+        self.current_step = None
+        self._step_started = None
 
     async def _init_browser(self):
-        """初始化浏览器"""
-        log("初始化浏览器...")
-        self.browser = await AsyncCamoufox(
-            headless=self.headless,
-            humanize=True,
-            locale='zh-CN',
-            geoip=False,
-        ).__aenter__()
-        self.page = await self.browser.new_page()
+        """初始化浏览器；使用共享浏览器时只创建独立的上下文"""
+        # 恢复保存的 Cookie 与 localStorage
+        context_options = {}
+        if self.profile and self.profile.storage_state():
+            context_options['storage_state'] = self.profile.storage_state()
+
+        if self.shared_browser is not None:
+            self.context = await self.shared_browser.new_context(**context_options)
+            self.page = await self.context.new_page()
+        else:
+            from camoufox.async_api import AsyncCamoufox
+
+            log("初始化浏览器...")
+            options = camoufox_options(self.headless)
+            if self.profile:
+                # 使用该账号固定的指纹
+                try:
+                    options.update(self.profile.launch_options())
+                except Exception as e:
+                    log(f"[WARN] 读取固定指纹失败，使用随机指纹: {e}")
+            started = time.perf_counter()
+            self._camoufox = AsyncCamoufox(**options)
+            self.browser = await self._camoufox.__aenter__()
+            self._observe('browser_launch_seconds', time.perf_counter() - started)
+            if context_options:
+                self.context = await self.browser.new_context(**context_options)
+                self.page = await self.context.new_page()
+            else:
+                self.page = await self.browser.new_page()
+
+        self.network = NetworkAccounting()
+        await self._attach_page()
+
+    async def _attach_page(self):
+        """在新页面上注册流量统计和静态资源缓存"""
+        self.network.attach(self.page)
+        if self.asset_cache:
+            await self.asset_cache.attach(self.page, on_hit=self.network.mark_cached)
+
+    async def _reset_context(self):
+        """丢弃恢复的 Cookie 与 localStorage：关闭当前上下文，新建一个不带登录状态的上下文"""
+        await self.network.drain()
+        await self.page.close()
+        if self.context:
+            await self.context.close()
+        browser = self.shared_browser if self.shared_browser is not None else self.browser
+        self.context = await browser.new_context()
+        self.page = await self.context.new_page()
+        await self._attach_page()
+
+    def _observe(self, name, elapsed):
+        """记录阶段耗时（秒）到指标（未启用指标时忽略）"""
+        if self.metrics is None:
+            return
+        histogram = getattr(self.metrics, name)
+        if histogram.labelnames:
+            histogram.observe(elapsed, site=self.metrics.site(self.base_url))
+        else:
+            histogram.observe(elapsed)
 
     async def _close_browser(self):
-        """关闭浏览器"""
-        if self.browser:
+        """关闭浏览器（超时取消时同样会执行，先关闭页面再关闭浏览器）"""
+        if self.network:
+            try:
+                await self.network.drain()
+            except Exception:
+                pass
+        if self.profile and self.page and self.logged_in:
+            # 保存登录状态，下次运行可直接跳过登录
+            try:
+                await self.profile.save_state(self.page.context)
+            except Exception as e:
+                log(f"[WARN] 保存登录状态失败: {e}")
+        if self.page:
             try:
-                await self.browser.__aexit__(None, None, None)
-            except:
+                await self.page.close()
+            except Exception:
                 pass
+            self.page = None
+        if self.context:
+            try:
+                await self.context.close()
+            except Exception:
+                pass
+            self.context = None
+        if self._camoufox:
+            try:
+                await self._camoufox.__aexit__(None, None, None)
+            except Exception:
+                pass
+            self._camoufox = None
+            self.browser = None
+
+    def _step(self, name=None):
+        """结束当前登录步骤并开始下一个；name 为 None 时只结束当前步骤"""
+        now = time.perf_counter()
+        if self.current_step is not None:
+            self.step_timings.append((self.current_step, now - self._step_started))
+        self.current_step = name
+        self._step_started = now
+
+    async def _restore_session(self):
+        """打开首页并读取保存的用户信息，存在时视为已登录（有效性由随后的接口调用确认）"""
+        try:
+            log("使用保存的登录状态...")
+            await self.page.goto(f"{self.base_url}/", wait_until='domcontentloaded', timeout=30000)
+            user_str = await self.page.evaluate('() => localStorage.getItem("user")')
+            self.user_id = json.loads(user_str).get('id') if user_str else None
+        except Exception as e:
+            log(f"恢复登录状态失败: {e}")
+            return False
+        return bool(self.user_id)
 
     async def login(self):
         """登录到 anyrouter.top（支持重试）"""
@@ -282,25 +639,103 @@ class AnyrouteCheckin:
             if success:
                 return True
 
+            if self.failure in ('credentials', 'maintenance'):
+                log("凭据错误或网站维护中，不再重试")
+                break
+
             if attempt < max_retries:
                 log(f"登录失败，刷新页面并重试...")
                 await self.page.wait_for_timeout(2000)
             else:
                 log(f"登录失败，已尝试 {max_retries} 次")
 
+        if self.failure == 'unavailable':
+            # 重试后仍遇到网关错误，按网站不可用处理，同一网站的其余账号推迟到下次运行
+            self.failure = 'maintenance'
         return False
 
+    async def _wait_for_login_form(self, http_status=None):
+        """轮询页面状态直到登录表单出现
+
+        维护页和网关错误页立即返回；挑战页给 CHALLENGE_GRACE 秒让其自带的 JS 验证完成并跳转，
+        仍未通过则返回 'challenge'；超过 LOGIN_FORM_TIMEOUT 秒返回 'loading'。
+        """
+        form_timeout = float(os.environ.get('LOGIN_FORM_TIMEOUT') or '20')
+        challenge_grace = float(os.environ.get('CHALLENGE_GRACE') or '5')
+        started = time.monotonic()
+        challenge_since = None
+
+        while True:
+            try:
+                snapshot = await self.page.evaluate(PAGE_SNAPSHOT_JS)
+            except Exception:
+                # 页面正在跳转（例如挑战页验证通过后刷新），稍后重试
+                snapshot = {}
+            state = classify_page(snapshot, http_status)
+
+            if state in ('form', 'maintenance', 'unavailable'):
+                return state
+            now = time.monotonic()
+            if state == 'challenge':
+                challenge_since = challenge_since or now
+                if now - challenge_since >= challenge_grace:
+                    return 'challenge'
+            else:
+                challenge_since = None
+                # 跳转后的页面状态码不再适用
+                http_status = None
+            if now - started >= form_timeout:
+                return 'challenge' if challenge_since else 'loading'
+            await self.page.wait_for_timeout(250)
+
+    async def _wait_for_login_result(self, alerts_before=(), timeout_ms=10000):
+        """在页面内轮询，直到离开登录页、写入用户信息或出现提交前没有的提示"""
+        try:
+            await self.page.wait_for_function('''(before) => {
+                if (!location.pathname.startsWith('/login')) return true;
+                if (localStorage.getItem('user')) return true;
+                for (const el of document.querySelectorAll('.error, .alert, [role="alert"], .toast, .message')) {
+                    const text = (el.innerText || '').trim();
+                    if (text && text.length < 200 && !before.includes(text)) return true;
+                }
+                return false;
+            }''', arg=list(alerts_before), timeout=timeout_ms, polling=250)
+        except Exception:
+            pass
+
     async def _try_login_once(self):
         """尝试一次登录"""
+        self.failure = None
         try:
-            # 访问登录页面
+            # 访问登录页面：只等到 DOMContentLoaded，之后按需等待登录表单
             login_page_url = f"{self.base_url}/login"
             log(f"访问登录页面: {login_page_url}")
-            await self.page.goto(login_page_url, wait_until='networkidle', timeout=60000)
+            self._step('open_page')
+            response = await self.page.goto(login_page_url, wait_until='domcontentloaded', timeout=30000)
+            http_status = response.status if response else None
 
-            # 等待页面渲染
+            # 等待登录表单渲染，遇到挑战页或维护页立即结束本次尝试
             log("等待页面渲染...")
-            await self.page.wait_for_timeout(3000)
+            self._step('wait_form')
+            page_state = await self._wait_for_login_form(http_status)
+            if page_state != 'form':
+                self.failure = page_state if page_state != 'loading' else None
+                if page_state == 'challenge':
+                    log("[FAIL] 遇到人机验证/反爬挑战页面")
+                elif page_state == 'maintenance':
+                    log(f"[FAIL] 网站维护中或不可用 (HTTP {http_status})")
+                elif page_state == 'unavailable':
+                    log(f"[FAIL] 网站网关错误 (HTTP {http_status})，可能是短暂故障")
+                else:
+                    log("[FAIL] 登录表单未在限定时间内出现")
+                return False
+
+            # 登录表单可见后，公告弹窗可能随后加载，短暂等待网络空闲（不强求）
+            self._step('dismiss_popups')
+            try:
+                await self.page.wait_for_load_state('networkidle', timeout=3000)
+            except Exception:
+                pass
 
             # 关闭可能存在的弹窗
             log("检查并关闭弹窗...")
@@ -308,37 +743,39 @@ class AnyrouteCheckin:
                 await self.page.keyboard.press('Escape')
                 await self.page.wait_for_timeout(500)
 
-            # 打印当前页面所有可点击元素，用于调试
-            log("分析页面元素...")
-            page_info = await self.page.evaluate('''() => {
-                const result = { buttons: [], links: [], inputs: [] };
-
-                document.querySelectorAll('button').forEach(el => {
-                    result.buttons.push(el.innerText.trim());
-                });
-
-                document.querySelectorAll('a, span[role="button"], div[role="button"]').forEach(el => {
-                    const text = el.innerText.trim();
-                    if (text && text.length < 50) result.links.push(text);
-                });
-
-                document.querySelectorAll('input').forEach(el => {
-                    result.inputs.push({
-                        type: el.type,
-                        id: el.id,
-                        placeholder: el.placeholder
+            # 打印当前页面所有可点击元素，用于调试（仅 DEBUG 级别，否则不做这次页面查询）
+            if debug_enabled():
+                log("分析页面元素...", logging.DEBUG)
+                page_info = await self.page.evaluate('''() => {
+                    const result = { buttons: [], links: [], inputs: [] };
+
+                    document.querySelectorAll('button').forEach(el => {
+                        result.buttons.push(el.innerText.trim());
+                    });
+
+                    document.querySelectorAll('a, span[role="button"], div[role="button"]').forEach(el => {
+                        const text = el.innerText.trim();
+                        if (text && text.length < 50) result.links.push(text);
+                    });
+
+                    document.querySelectorAll('input').forEach(el => {
+                        result.inputs.push({
+                            type: el.type,
+                            id: el.id,
+                            placeholder: el.placeholder
+                        });
                     });
-                });
 
-                return result;
-            }''')
+                    return result;
+                }''')
 
-            log(f"按钮: {page_info.get('buttons', [])}")
-            log(f"链接: {page_info.get('links', [])[:10]}")  # 只显示前10个
-            log(f"输入框: {page_info.get('inputs', [])}")
+                log(f"按钮: {page_info.get('buttons', [])}", logging.DEBUG)
+                log(f"链接: {page_info.get('links', [])[:10]}", logging.DEBUG)  # 只显示前10个
+                log(f"输入框: {page_info.get('inputs', [])}", logging.DEBUG)
 
             # 步骤1: 点击"使用 邮箱或用户名 登录"
             log("步骤1: 切换到邮箱登录模式...")
+            self._step('switch_mode')
 
             # 检查是否已经有输入框了
             existing_inputs = await self.page.query_selector_all('input#username, input[type="text"]')
@@ -354,7 +791,7 @@ class AnyrouteCheckin:
                         await email_btn.click()
                         email_login_clicked = True
                         log("已点击邮箱登录按钮(方法1)")
-                except:
+                except Exception:
                     pass
 
                 if not email_login_clicked:
@@ -381,18 +818,20 @@ class AnyrouteCheckin:
                     log("未找到邮箱登录切换按钮，假设已经在邮箱登录模式")
 
             # 再次检查页面状态
-            log("检查切换后的页面状态...")
-            inputs_after = await self.page.query_selector_all('input')
-            log(f"切换后找到 {len(inputs_after)} 个输入框")
+            if debug_enabled():
+                log("检查切换后的页面状态...", logging.DEBUG)
+                inputs_after = await self.page.query_selector_all('input')
+                log(f"切换后找到 {len(inputs_after)} 个输入框", logging.DEBUG)
 
-            for inp in inputs_after:
-                inp_type = await inp.get_attribute('type') or ''
-                inp_id = await inp.get_attribute('id') or ''
-                inp_placeholder = await inp.get_attribute('placeholder') or ''
-                log(f"  输入框: type={inp_type}, id={inp_id}, placeholder={inp_placeholder}")
+                for inp in inputs_after:
+                    inp_type = await inp.get_attribute('type') or ''
+                    inp_id = await inp.get_attribute('id') or ''
+                    inp_placeholder = await inp.get_attribute('placeholder') or ''
+                    log(f"  输入框: type={inp_type}, id={inp_id}, placeholder={inp_placeholder}", logging.DEBUG)
 
             # 步骤2: 填写用户名
             log("步骤2: 填写用户名...")
+            self._step('fill_username')
             username_input = await self.page.query_selector('input#username, input[placeholder*="用户名"], input[placeholder*="邮箱"], input[type="text"]')
             if username_input:
                 await username_input.click()
@@ -405,6 +844,7 @@ class AnyrouteCheckin:
 
             # 步骤3: 填写密码
             log("步骤3: 填写密码...")
+            self._step('fill_password')
             password_input = await self.page.query_selector('input#password, input[type="password"]')
             if password_input:
                 await password_input.click()
@@ -419,6 +859,8 @@ class AnyrouteCheckin:
 
             # 步骤4: 点击"继续"按钮
             log("步骤4: 点击继续按钮...")
+            self._step('submit')
+            alerts_before = await self.page.evaluate(ALERT_TEXTS_JS)
             continue_btn = await self.page.query_selector('button:has-text("继续")')
             if continue_btn:
                 await continue_btn.click()
@@ -442,21 +884,15 @@ class AnyrouteCheckin:
                     log("[FAIL] 找不到继续按钮")
                     return False
 
-            # 等待登录完成
+            # 等待登录完成：跳转、写入用户信息或出现错误提示即结束等待
             log("等待登录响应...")
-            await self.page.wait_for_timeout(5000)
-
-            # 检查页面是否有错误提示
-            error_msg = await self.page.evaluate('''() => {
-                const errorElements = document.querySelectorAll('.error, .alert, [role="alert"], .toast, .message');
-                for (const el of errorElements) {
-                    const text = el.innerText.trim();
-                    if (text && text.length > 0 && text.length < 200) {
-                        return text;
-                    }
-                }
-                return null;
-            }''')
+            self._step('wait_result')
+            await self._wait_for_login_result(alerts_before)
+            self._step('check_result')
+
+            # 检查页面是否有提交后新出现的错误提示
+            new_alerts = [text for text in await self.page.evaluate(ALERT_TEXTS_JS) if text not in alerts_before]
+            error_msg = new_alerts[0] if new_alerts else None
 
             if error_msg:
                 log(f"页面错误提示: {error_msg}")
@@ -465,6 +901,13 @@ class AnyrouteCheckin:
             current_url = self.page.url
             log(f"当前 URL: {current_url}")
 
+            # 页面明确提示凭据错误时无需重试
+            if error_msg and '/login' in current_url and is_credential_error(error_msg):
+                log(f"[FAIL] 凭据错误: {error_msg}")
+                self.failure = 'credentials'
+                self.login_error = error_msg
+                return False
+
             # 检查是否登录成功 - 通过 localStorage 获取用户信息
             try:
                 user_str = await self.page.evaluate('() => localStorage.getItem("user")')
@@ -487,7 +930,7 @@ class AnyrouteCheckin:
                     if user_str:
                         user_data = json.loads(user_str)
                         self.user_id = user_data.get('id')
-                except:
+                except Exception:
                     pass
                 return True
 
@@ -497,73 +940,98 @@ class AnyrouteCheckin:
         except Exception as e:
             log(f"登录异常: {str(e)}")
             return False
+        finally:
+            self._step()
+
+    def _api_call(self, name):
+        """根据 API_ENDPOINTS 构造一次接口调用"""
+        method, path = API_ENDPOINTS[name]
+        return {
+            'name': name,
+            'method': method,
+            'url': f"{self.base_url}{path}",
+            'headers': {
+                'Content-Type': 'application/json',
+                'new-api-user': str(self.user_id or '')
+            }
+        }
 
-    async def checkin(self):
-        """执行签到（登录后自动签到）"""
-        try:
-            log("检查签到状态...")
-
-            # 签到是登录时自动完成的，直接调用API确认
-            checkin_url = f"{self.base_url}/api/user/sign_in"
-            log(f"签到 URL: {checkin_url}")
-
-            js_code = f'''
-            async () => {{
-                try {{
-                    const response = await fetch("{checkin_url}", {{
-                        method: "POST",
-                        headers: {{
-                            "Content-Type": "application/json"
-                        }}
-                    }});
-                    const data = await response.json();
-                    return {{
-                        status: response.status,
-                        data: data
-                    }};
-                }} catch (e) {{
-                    return {{error: e.message}};
-                }}
-            }}
-            '''
-
-            result = await self.page.evaluate(js_code)
-            log(f"签到响应: {result}")
-
-            # 检查是否有网络错误
-            if result and result.get('error'):
-                error_msg = result.get('error')
-                log(f"[FAIL] 网络请求失败: {error_msg}")
-                return False
-
-            # 检查 HTTP 状态码
-            status = result.get('status') if result else None
-            data = result.get('data') if result else None
+    async def call_api(self, names):
+        """在页面内并发调用多个接口（一次 evaluate），返回 {名称: ApiResult}"""
+        calls = [self._api_call(name) for name in names]
+        for call in calls:
+            log(f"{call['method']} {call['url']}", logging.DEBUG)
+
+        raw_results = await self.page.evaluate(API_BATCH_JS, calls)
+        results = {raw['name']: ApiResult.from_raw(raw) for raw in raw_results}
+        for result in results.values():
+            log(f"接口 {result.name}: HTTP {result.status} {result.elapsed_ms:.0f}ms", logging.DEBUG)
+        return results
+
+    def _parse_sign_in(self, result):
+        """解析签到接口结果"""
+        log("检查签到状态...")
+        log(f"签到响应: {result}", logging.DEBUG)
+
+        # 检查是否有网络错误
+        if result.error:
+            log(f"[FAIL] 网络请求失败: {result.error}")
+            return False
 
-            if not data:
-                log("[FAIL] API 响应为空，签到状态未知")
-                return False
+        data = result.data
+        if not data:
+            log("[FAIL] API 响应为空，签到状态未知")
+            return False
 
-            # 判断 API 返回的 success 字段
-            if data.get('success') is True:
-                msg = data.get('message', '签到成功')
-                log(f"[OK] {msg}")
+        # 判断 API 返回的 success 字段
+        if data.get('success') is True:
+            msg = data.get('message', '签到成功')
+            log(f"[OK] {msg}")
+            return True
+        elif data.get('success') is False:
+            # API 明确返回失败
+            msg = data.get('message', '未知错误')
+            # 检查是否是"已经签到"的错误
+            if '已经签到' in str(msg) or 'already' in str(msg).lower():
+                log(f"[OK] 今日已签到")
                 return True
-            elif data.get('success') is False:
-                # API 明确返回失败
-                msg = data.get('message', '未知错误')
-                # 检查是否是"已经签到"的错误
-                if '已经签到' in str(msg) or 'already' in str(msg).lower():
-                    log(f"[OK] 今日已签到")
-                    return True
-                log(f"[FAIL] 签到失败: {msg}")
-                return False
-            else:
-                # success 字段不存在或不是布尔值
-                log(f"[WARN] API 响应格式异常: {data}")
-                log("[FAIL] 无法确认签到状态")
-                return False
+            log(f"[FAIL] 签到失败: {msg}")
+            return False
+        else:
+            # success 字段不存在或不是布尔值
+            log(f"[WARN] API 响应格式异常: {data}")
+            log("[FAIL] 无法确认签到状态")
+            return False
+
+    def _parse_user_info(self, result):
+        """解析用户信息接口结果"""
+        data = result.data
+        if data and data.get('success'):
+            user_data = data.get('data', {})
+            quota = round(user_data.get('quota', 0) / 500000, 2)
+            used_quota = round(user_data.get('used_quota', 0) / 500000, 2)
+            bonus_quota = round(user_data.get('bonus_quota', 0) / 500000, 2)
+
+            log(f"  当前余额: ${quota}")
+            log(f"  已使用: ${used_quota}")
+            log(f"  奖励余额: ${bonus_quota}")
+
+            return {
+                'quota': quota,
+                'used_quota': used_quota,
+                'bonus_quota': bonus_quota
+            }
+        else:
+            error_msg = result.error or (data.get('message', '未知错误') if data else '无响应')
+            log(f"[FAIL] 获取用户信息失败: {error_msg}")
+            return None
 
+    async def checkin(self):
+        """执行签到（登录后自动签到）"""
+        try:
+            # 签到是登录时自动完成的，直接调用API确认
+            results = await self.call_api(['sign_in'])
+            return self._parse_sign_in(results['sign_in'])
         except Exception as e:
             log(f"[FAIL] 签到异常: {str(e)}")
             return False
@@ -572,77 +1040,79 @@ class AnyrouteCheckin:
         """获取用户信息"""
         try:
             log("获取用户信息...")
-
-            user_info_url = f"{self.base_url}/api/user/self"
-
-            js_code = f'''
-            async () => {{
-                try {{
-                    const response = await fetch("{user_info_url}", {{
-                        method: "GET",
-                        headers: {{
-                            "Content-Type": "application/json",
-                            "new-api-user": "{self.user_id or ''}"
-                        }}
-                    }});
-                    return await response.json();
-                }} catch (e) {{
-                    return {{error: e.message}};
-                }}
-            }}
-            '''
-
-            result = await self.page.evaluate(js_code)
-
-            if result and result.get('success'):
-                user_data = result.get('data', {})
-                quota = round(user_data.get('quota', 0) / 500000, 2)
-                used_quota = round(user_data.get('used_quota', 0) / 500000, 2)
-                bonus_quota = round(user_data.get('bonus_quota', 0) / 500000, 2)
-
-                log(f"  当前余额: ${quota}")
-                log(f"  已使用: ${used_quota}")
-                log(f"  奖励余额: ${bonus_quota}")
-
-                return {
-                    'quota': quota,
-                    'used_quota': used_quota,
-                    'bonus_quota': bonus_quota
-                }
-            else:
-                error_msg = result.get('message', '未知错误') if result else '无响应'
-                log(f"[FAIL] 获取用户信息失败: {error_msg}")
-                return None
-
+            results = await self.call_api(['user_info'])
+            return self._parse_user_info(results['user_info'])
         except Exception as e:
             log(f"[FAIL] 获取用户信息异常: {str(e)}")
             return None
 
+    async def _checkin_and_fetch(self, sign_in_first=False):
+        """签到、用户信息以及账号配置的额外接口合并为一次页面往返
+
+        登录时网站已自动签到，签到接口与用户信息可以并发调用；复用保存的登录状态时签到由签到接口完成，
+        sign_in_first=True 先调用签到接口再读取用户信息，保证余额是签到后的值。
+        """
+        extra = [name for name in self.extra_api if name in API_ENDPOINTS]
+        try:
+            log("签到并获取用户信息...")
+            if sign_in_first:
+                self.api_results = await self.call_api(['sign_in'])
+                self.api_results.update(await self.call_api(['user_info'] + extra))
+            else:
+                self.api_results = await self.call_api(['sign_in', 'user_info'] + extra)
+        except Exception as e:
+            log(f"[FAIL] 签到异常: {str(e)}")
+            return False, None
+
+        sign_in = self.api_results['sign_in']
+        user_info = self.api_results['user_info']
+        self._observe('sign_in_seconds', sign_in.elapsed_ms / 1000)
+        self._observe('user_info_seconds', user_info.elapsed_ms / 1000)
+        return self._parse_sign_in(sign_in), self._parse_user_info(user_info)
+
     async def run(self):
         """运行签到流程"""
-        print("=" * 50)
-        print(f"账号: {self.account_name}")
-        print(f"目标网站: {self.base_url}")
-        print(f"Headless 模式: {self.headless}")
-        print("=" * 50)
+        echo("=" * 50)
+        echo(f"账号: {self.account_name}")
+        echo(f"目标网站: {self.base_url}")
+        echo(f"Headless 模式: {self.headless}")
+        echo("=" * 50)
 
         try:
             await self._init_browser()
 
-            if not await self.login():
-                log("程序终止：登录失败")
-                return False, None
-
-            checkin_success = await self.checkin()
-            user_info = await self.get_user_info()
+            if self.profile and self.profile.storage_state():
+                if await self._restore_session():
+                    checkin_success, user_info = await self._checkin_and_fetch(sign_in_first=True)
+                    if user_info is not None:
+                        log(f"[OK] 登录状态有效，已跳过登录 (ID: {self.user_id})")
+                        self.session_restored = self.logged_in = True
+                if not self.session_restored:
+                    # 失效的 Cookie 和 localStorage.user 会让登录流程误判为已登录，换成干净的上下文再登录
+                    log("[WARN] 保存的登录状态已失效，重新登录")
+                    self.profile.clear_state()
+                    self.user_id = None
+                    await self._reset_context()
+
+            if not self.session_restored:
+                started = time.perf_counter()
+                self.logged_in = await self.login()
+                self._observe('login_seconds', time.perf_counter() - started)
+                if not self.logged_in:
+                    self.failure = self.failure or 'login'
+                    log("程序终止：登录失败")
+                    return False, None
+
+                checkin_success, user_info = await self._checkin_and_fetch()
 
             if not checkin_success:
+                self.failure = 'sign_in'
                 log("程序终止：签到失败")
                 return False, None
 
-            print("=" * 50)
+            echo("=" * 50)
             log("[OK] 签到流程完成")
-            print("=" * 50)
+            echo("=" * 50)
             return True, user_info
 
         finally:
@@ -657,16 +1127,16 @@ def load_accounts():
         try:
             accounts = json.loads(accounts_json)
             if not isinstance(accounts, list):
-                print("错误: ACCOUNTS 必须是 JSON 数组格式")
+                log("错误: ACCOUNTS 必须是 JSON 数组格式", logging.ERROR)
                 return None
 
             # 验证每个账号的格式
             for i, account in enumerate(accounts):
                 if not isinstance(account, dict):
-                    print(f"错误: ACCOUNTS[{i}] 必须是对象")
+                    log(f"错误: ACCOUNTS[{i}] 必须是对象", logging.ERROR)
                     return None
                 if 'email' not in account or 'password' not in account:
-                    print(f"错误: ACCOUNTS[{i}] 缺少 email 或 password 字段")
+                    log(f"错误: ACCOUNTS[{i}] 缺少 email 或 password 字段", logging.ERROR)
                     return None
 
                 # 设置默认 name
@@ -675,7 +1145,7 @@ def load_accounts():
 
             return accounts
         except json.JSONDecodeError as e:
-            print(f"错误: ACCOUNTS JSON 解析失败: {e}")
+            log(f"错误: ACCOUNTS JSON 解析失败: {e}", logging.ERROR)
             return None
 
     # 兼容单账号模式
@@ -692,19 +1162,354 @@ def load_accounts():
     return None
 
 
-async def run_account_checkin(account, default_base_url, headless):
-    """运行单个账号的签到"""
-    # 优先使用账号自己的 url，否则使用默认 url
-    account_url = account.get('url') or default_base_url
+def make_result(account, status, quota_info='', **fields):
+    """构造单个账号的签到结果"""
+    result = {
+        'name': account['name'],
+        'success': status == 'success',
+        'status': status,
+        'quota_info': quota_info
+    }
+    result.update(fields)
+    return result
+
+
+def next_account(pending, slow_sites, default_base_url):
+    """从待处理队列取出下一个账号，已出现超时的网站的账号排到最后"""
+    for i, account in enumerate(pending):
+        if (account.get('url') or default_base_url) not in slow_sites:
+            return pending.pop(i)
+    return pending.pop(0)
+
+
+def record_outcome(metrics, site_url, status, failure=None):
+    """按结果和失败类型累计账号指标"""
+    site = metrics.site(site_url)
+    if status in SKIP_REASONS:
+        metrics.skipped.inc(site=site, reason=SKIP_REASONS[status])
+        return
+    metrics.accounts.inc(site=site, result=status)
+    if status != 'success':
+        metrics.failures.inc(site=site, **{'class': failure or status})
+
+
+def print_network_summary(results, budget_kb=0):
+    """按站点汇总流量，站点平均流量超出预算时标记"""
+    sites = {}
+    for result in results:
+        network = result.get('network')
+        if not network:
+            continue
+        site = sites.setdefault(result['url'], {'accounts': 0, 'bytes': 0, 'requests': 0})
+        site['accounts'] += 1
+        site['bytes'] += network['bytes']
+        site['requests'] += network['requests']
+    if not sites:
+        return
+
+    echo("  流量统计:")
+    for url, site in sites.items():
+        average_kb = site['bytes'] / site['accounts'] / 1024
+        over = "（平均超出预算）" if budget_kb and average_kb > budget_kb else ""
+        echo(f"    - {url}: {site['accounts']} 个账号，共 {site['bytes'] / 1024:.0f} KB/"
+             f"{site['requests']} 请求，平均 {average_kb:.0f} KB{over}")
+
+
+class CheckinSession:
+    """可嵌入其他程序的异步签到会话，持有浏览器、静态资源缓存和指标等资源
+
+    用法:
+        async with CheckinSession(headless=True) as session:
+            result = await session.checkin(account)
+            async for result in session.checkin_many(accounts, concurrency=3):
+                ...
+
+    shared_browser=True 时整个会话只启动一次浏览器，每个账号使用独立的浏览器上下文；
+    为 False 时每个账号单独启动浏览器（指纹互不相同）。
+    account_timeout 为 0 或 None 时不限制单个账号的处理时间（与 run_budget 一致）。
+    """
+
+    def __init__(self, base_url=None, headless=True, asset_cache=None, metrics=None,
+                 quarantine=None, shared_browser=True, account_timeout=180,
+                 min_account_time=30, account_interval=3, net_budget_kb=0, profiles=None):
+        self.base_url = base_url or 'https://anyrouter.top'
+        self.headless = headless
+        self.asset_cache = asset_cache
+        self.metrics = metrics or CheckinMetrics()
+        self.quarantine = quarantine
+        self.shared_browser = shared_browser
+        # 0 表示不限制；直接传给 wait_for 会让每个账号立即超时
+        self.account_timeout = account_timeout if account_timeout and account_timeout > 0 else None
+        self.min_account_time = min_account_time
+        self.account_interval = account_interval
+        # 单个账号的流量预算（KB），0 表示不检查
+        self.net_budget_kb = net_budget_kb
+        # 每个账号的持久化浏览器配置（ProfileStore），为 None 时不保存登录状态
+        self.profiles = profiles
+        self.browser = None
+        self._camoufox = None
 
-    checkin = AnyrouteCheckin(
-        email=account['email'],
-        password=account['password'],
-        base_url=account_url,
-        headless=headless,
-        account_name=account['name']
-    )
-    return await checkin.run()
+    async def __aenter__(self):
+        if self.shared_browser:
+            from camoufox.async_api import AsyncCamoufox
+
+            log("初始化共享浏览器...")
+            started = time.perf_counter()
+            self._camoufox = AsyncCamoufox(**camoufox_options(self.headless))
+            self.browser = await self._camoufox.__aenter__()
+            self.metrics.browser_launch_seconds.observe(time.perf_counter() - started)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._camoufox:
+            try:
+                await self._camoufox.__aexit__(exc_type, exc, tb)
+            except Exception:
+                pass
+            self._camoufox = None
+            self.browser = None
+        self.flush()
+
+    def flush(self):
+        """持久化静态资源缓存索引并刷新指标文件"""
+        if self.asset_cache:
+            self.asset_cache.save()
+            self.metrics.asset_cache_requests.set_total(self.asset_cache.hits, result='hit')
+            self.metrics.asset_cache_requests.set_total(self.asset_cache.misses, result='miss')
+        self.metrics.flush()
+        if self.quarantine:
+            self.quarantine.save()
+
+    async def _quarantined_result(self, account):
+        """账号在隔离期内时返回跳过结果，否则返回 None"""
+        if not self.quarantine:
+            return None
+        key = account_key(account, self.base_url)
+        # 比对密码指纹需要一次 scrypt 计算（约 50ms），放到线程中执行，避免阻塞其他账号的页面
+        if self.quarantine.get(key) is None or not await asyncio.to_thread(
+                self.quarantine.is_quarantined, key, account['password']):
+            return None
+
+        account_url = account.get('url') or self.base_url
+        entry = self.quarantine.get(key)
+        next_probe = datetime.fromtimestamp(self.quarantine.next_probe(key)).strftime('%Y-%m-%d %H:%M')
+        log(f"[SKIP] 账号 {account['name']} 凭据错误已隔离（{entry.get('reason', '')}），"
+            f"{next_probe} 后重新尝试")
+        record_outcome(self.metrics, account_url, 'quarantined')
+        return make_result(
+            account, 'quarantined',
+            url=account_url,
+            failure='credentials',
+            quarantine={'since': entry['since'], 'reason': entry.get('reason'), 'next_probe': next_probe}
+        )
+
+    async def _update_quarantine(self, account, result, login_error):
+        if not self.quarantine:
+            return
+        key = account_key(account, self.base_url)
+        if result['failure'] == 'credentials':
+            await asyncio.to_thread(self.quarantine.add, key, account['name'], login_error, account['password'])
+            log(f"[WARN] 账号 {account['name']} 已加入凭据错误隔离名单")
+        elif result['success'] and self.quarantine.release(key):
+            log(f"账号 {account['name']} 登录成功，已解除隔离")
+
+    def _record_network(self, account, account_url, network):
+        """汇总账号流量，写入指标并检查预算"""
+        if network is None:
+            return None
+        summary = network.summary(int(self.net_budget_kb * 1024))
+        site = self.metrics.site(account_url)
+        for resource_type, bucket in summary['by_type'].items():
+            self.metrics.network_bytes.inc(bucket['bytes'], site=site, type=resource_type)
+            self.metrics.network_requests.inc(bucket['requests'], site=site, type=resource_type)
+
+        log(f"流量: {summary['bytes'] / 1024:.0f} KB，{summary['requests']} 个请求"
+            f"（缓存命中 {summary['cached']}，失败 {summary['failed']}）")
+        if summary['over_budget']:
+            log(f"[WARN] 账号 {account['name']} 流量 {summary['bytes'] / 1024:.0f} KB "
+                f"超出预算 {self.net_budget_kb:.0f} KB")
+        return summary
+
+    @staticmethod
+    def _with_name(account):
+        """未指定账号名时使用用户名（与 load_accounts 一致），不修改调用方传入的字典"""
+        if 'name' in account:
+            return account
+        return {**account, 'name': account['email']}
+
+    async def checkin(self, account, timeout=None):
+        """签到单个账号，返回结果字典（不会抛出账号级别的异常）"""
+        account = self._with_name(account)
+        # 优先使用账号自己的 url，否则使用默认 url
+        skipped = await self._quarantined_result(account)
+        if skipped:
+            return skipped
+
+        account_url = account.get('url') or self.base_url
+        # timeout 为 None 时 wait_for 不设截止时间
+        timeout = timeout or self.account_timeout
+
+        checkin = AnyrouteCheckin(
+            email=account['email'],
+            password=account['password'],
+            base_url=account_url,
+            headless=self.headless,
+            account_name=account['name'],
+            asset_cache=self.asset_cache,
+            metrics=self.metrics,
+            browser=self.browser,
+            extra_api=account.get('extra_api'),
+            profile=self.profiles.get(account, self.base_url) if self.profiles else None,
+        )
+
+        user_info = None
+        failure = None
+        started = time.monotonic()
+        # 该账号的日志都带上账号名和站点，并发处理时可区分
+        with account_context(account=account['name'], site=account_url):
+            try:
+                success, user_info = await asyncio.wait_for(checkin.run(), timeout=timeout)
+                failure = checkin.failure
+                if success:
+                    status = 'success'
+                elif failure in ('challenge', 'maintenance'):
+                    # 挑战页和维护页使用独立状态，便于调度与告警区分
+                    status = failure
+                else:
+                    status = 'failed'
+            except asyncio.TimeoutError:
+                # wait_for 取消任务时 run() 的 finally 会关闭该账号的页面和浏览器
+                log(f"[FAIL] 账号 {account['name']} 超过截止时间 {timeout:.0f}s，已取消")
+                status = 'timeout'
+            except Exception as e:
+                log(f"账号 {account['name']} 处理异常: {e}")
+                status = 'failed'
+                failure = 'exception'
+            network = self._record_network(account, account_url, checkin.network)
+
+        # 格式化余额信息
+        quota_info = f"${user_info.get('quota', 0)}" if user_info else ""
+        record_outcome(self.metrics, account_url, status, failure)
+        result = make_result(
+            account, status, quota_info,
+            url=account_url,
+            failure=failure,
+            user_info=user_info,
+            login_error=checkin.login_error,
+            elapsed=round(time.monotonic() - started, 3),
+            network=network,
+            session_restored=checkin.session_restored,
+            # 额外接口的返回数据，以及所有接口的状态码和页面内耗时
+            api={name: checkin.api_results[name].data for name in checkin.extra_api
+                 if name in checkin.api_results},
+            api_timing={name: {'status': r.status, 'elapsed_ms': round(r.elapsed_ms, 1)}
+                        for name, r in checkin.api_results.items()}
+        )
+        await self._update_quarantine(account, result, checkin.login_error)
+        return result
+
+    async def checkin_many(self, accounts, concurrency=1, run_budget=None):
+        """并发签到多个账号，按完成顺序逐个产出结果
+
+        run_budget 为整批的时间预算（秒），剩余预算不足 min_account_time 时，
+        尚未开始的账号以 'deferred' 状态产出；已出现超时或挑战页的网站的账号排到队列末尾，
+        已确认维护中的网站的其余账号直接以 'deferred' 状态产出。
+        """
+        accounts = [self._with_name(account) for account in accounts]
+        total = len(accounts)
+        if not total:
+            return
+
+        run_deadline = time.monotonic() + run_budget if run_budget else None
+        slow_sites = set()
+        maintenance_sites = set()
+        finished = asyncio.Queue()
+        started_count = 0
+
+        # 隔离期内的账号直接产出跳过结果，不占用工作协程和账号间隔
+        pending = []
+        for account in accounts:
+            skipped = await self._quarantined_result(account)
+            if skipped:
+                finished.put_nowait(skipped)
+            else:
+                pending.append(account)
+        to_run = len(pending)
+
+        def defer_remaining(account, remaining):
+            deferred = [account] + pending
+            pending.clear()
+            log(f"[WARN] 运行预算剩余 {max(remaining, 0):.0f}s，推迟剩余 {len(deferred)} 个账号")
+            for item in deferred:
+                account_url = item.get('url') or self.base_url
+                record_outcome(self.metrics, account_url, 'deferred')
+                finished.put_nowait(make_result(item, 'deferred', url=account_url))
+
+        async def worker():
+            nonlocal started_count
+            ran = False
+            while pending:
+                account = next_account(pending, slow_sites, self.base_url)
+                account_url = account.get('url') or self.base_url
+                if account_url in maintenance_sites:
+                    # 该网站已确认维护中，同站点的剩余账号直接推迟
+                    record_outcome(self.metrics, account_url, 'deferred')
+                    finished.put_nowait(make_result(account, 'deferred', url=account_url, failure='maintenance'))
+                    continue
+
+                # 同一个工作协程的相邻账号之间等待一段时间，避免请求过快
+                interval = self.account_interval if ran else 0
+                if run_deadline is not None:
+                    # 先扣除账号间隔再检查预算，预算不足时直接推迟，不再白白等待
+                    remaining = run_deadline - time.monotonic()
+                    if remaining - interval < self.min_account_time:
+                        # 预算不足以完成一次签到，剩余账号推迟到下次运行
+                        defer_remaining(account, remaining)
+                        break
+                if interval:
+                    await asyncio.sleep(interval)
+                ran = True
+
+                timeout = self.account_timeout
+                if run_deadline is not None:
+                    remaining = run_deadline - time.monotonic()
+                    timeout = min(timeout, remaining) if timeout else remaining
+
+                started_count += 1
+                echo(f"\n开始处理第 {started_count}/{to_run} 个账号...")
+                try:
+                    result = await self.checkin(account, timeout)
+                except Exception as e:
+                    # checkin() 自身的账号级异常已转换为结果，这里兜底其外围代码（构造、统计、隔离名单）的异常，
+                    # 保证每个账号都有结果产出，否则迭代方会一直等待
+                    log(f"[FAIL] 账号 {account['name']} 处理异常: {e}")
+                    record_outcome(self.metrics, account_url, 'failed', 'exception')
+                    result = make_result(account, 'failed', url=account_url, failure='exception')
+                if result['status'] in ('timeout', 'challenge'):
+                    slow_sites.add(account_url)
+                elif result['status'] == 'maintenance':
+                    maintenance_sites.add(account_url)
+                finished.put_nowait(result)
+
+        async def guarded_worker():
+            # 工作协程自身出错时把异常交给迭代方重新抛出，而不是静默退出
+            try:
+                await worker()
+            except Exception as e:
+                finished.put_nowait(e)
+
+        workers = [asyncio.create_task(guarded_worker()) for _ in range(max(1, min(concurrency, to_run)))]
+        try:
+            for _ in range(total):
+                result = await finished.get()
+                if isinstance(result, Exception):
+                    raise result
+                yield result
+        finally:
+            # 调用方提前结束迭代时取消仍在运行的账号
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
 
 
 async def main_async():
@@ -719,78 +1524,136 @@ async def main_async():
 
     # 加载账号配置
     accounts = load_accounts()
+    report_startup_time('加载账号配置')
     if not accounts:
-        print("错误: 请设置环境变量 ACCOUNTS 或 ANYROUTE_EMAIL 和 ANYROUTE_PASSWORD")
-        print("\n多账号模式（ACCOUNTS）:")
-        print('  ACCOUNTS=\'[{"name":"账号1","email":"user1","password":"pass1"},{"name":"账号2","email":"user2","password":"pass2"}]\'')
-        print("\n单账号模式（兼容模式）:")
-        print("  ANYROUTE_EMAIL=your_email")
-        print("  ANYROUTE_PASSWORD=your_password")
-        print("\n可选配置:")
-        print("  ANYROUTE_BASE_URL (默认: https://anyrouter.top)")
-        print("  HEADLESS=false (显示浏览器窗口)")
-        print("\n邮件通知配置（可选）:")
-        print("  SMTP_SERVER=smtp.gmail.com")
-        print("  SMTP_PORT=587")
-        print("  SMTP_USER=your_email@gmail.com")
-        print("  SMTP_PASSWORD=your_app_password")
-        print("  EMAIL_TO=recipient@example.com")
+        log("错误: 请设置环境变量 ACCOUNTS 或 ANYROUTE_EMAIL 和 ANYROUTE_PASSWORD", logging.ERROR)
+        echo("\n多账号模式（ACCOUNTS）:")
+        echo('  ACCOUNTS=\'[{"name":"账号1","email":"user1","password":"pass1"},{"name":"账号2","email":"user2","password":"pass2"}]\'')
+        echo("\n单账号模式（兼容模式）:")
+        echo("  ANYROUTE_EMAIL=your_email")
+        echo("  ANYROUTE_PASSWORD=your_password")
+        echo("\n可选配置:")
+        echo("  ANYROUTE_BASE_URL (默认: https://anyrouter.top)")
+        echo("  HEADLESS=false (显示浏览器窗口)")
+        echo("\n邮件通知配置（可选）:")
+        echo("  SMTP_SERVER=smtp.gmail.com")
+        echo("  SMTP_PORT=587")
+        echo("  SMTP_USER=your_email@gmail.com")
+        echo("  SMTP_PASSWORD=your_app_password")
+        echo("  EMAIL_TO=recipient@example.com")
         return False
 
     base_url = os.environ.get('ANYROUTE_BASE_URL') or 'https://anyrouter.top'
     headless = os.environ.get('HEADLESS', 'true').lower() == 'true'
 
+    # 静态资源缓存（可选），所有账号共享
+    asset_cache = AssetCache.from_env()
+    # 运行指标，配置 METRICS_FILE 时以 Prometheus 文本格式写入文件
+    metrics = CheckinMetrics.from_env()
+    run_started = time.monotonic()
+
     # 执行签到
-    print("\n" + "=" * 50)
-    print("Anyrouter 自动签到脚本 (Camoufox)")
-    print(f"共 {len(accounts)} 个账号")
-    print("=" * 50 + "\n")
+    echo("\n" + "=" * 50)
+    echo("Anyrouter 自动签到脚本 (Camoufox)")
+    echo(f"共 {len(accounts)} 个账号")
+    echo("=" * 50 + "\n")
+
+    # 凭据错误隔离名单，已删除或已修改凭据的账号的记录会被清理
+    quarantine = CredentialQuarantine.from_env()
+    # 邮件通知模式（full / digest / daily）
+    notifier = Notifier.from_env(STATUS_TEXT)
+    if quarantine:
+        quarantine.prune(account_key(account, base_url) for account in accounts)
+    # 每个账号的持久化浏览器配置（可选），清理已删除账号的目录
+    profiles = ProfileStore.from_env()
+    if profiles:
+        removed = profiles.prune(profile_key(account, base_url) for account in accounts)
+        if removed:
+            log(f"已清理 {removed} 个已删除账号的浏览器配置")
+
+    session = CheckinSession(
+        base_url=base_url,
+        headless=headless,
+        asset_cache=asset_cache,
+        metrics=metrics,
+        quarantine=quarantine,
+        # 默认每个账号单独启动浏览器，各自使用不同指纹
+        shared_browser=os.environ.get('SHARED_BROWSER', 'false').lower() == 'true',
+        # 单账号截止时间（秒），超时的账号会被取消并关闭浏览器
+        account_timeout=float(os.environ.get('ACCOUNT_TIMEOUT') or '180'),
+        min_account_time=float(os.environ.get('ACCOUNT_MIN_TIME') or '30'),
+        # 单账号流量预算（KB），超出时在日志和汇总中标记
+        net_budget_kb=float(os.environ.get('NET_BUDGET_KB') or '0'),
+        profiles=profiles,
+    )
+    concurrency = int(os.environ.get('CONCURRENCY') or '1')
+    run_budget = float(os.environ.get('RUN_BUDGET') or '0')
 
-    results = []
-    for i, account in enumerate(accounts, 1):
-        print(f"\n开始处理第 {i}/{len(accounts)} 个账号...")
-        try:
-            success, user_info = await run_account_checkin(account, base_url, headless)
-
-            # 格式化余额信息
-            quota_info = ""
-            if user_info:
-                quota_info = f"${user_info.get('quota', 0)}"
-
-            results.append({
-                'name': account['name'],
-                'success': success,
-                'quota_info': quota_info
-            })
-        except Exception as e:
-            log(f"账号 {account['name']} 处理异常: {e}")
-            results.append({
-                'name': account['name'],
-                'success': False,
-                'quota_info': ''
-            })
+    # 事件循环延迟监控（可选），用于发现阻塞整个事件循环的同步调用
+    loop_monitor = LoopMonitor.from_env()
+    if loop_monitor:
+        loop_monitor.start()
 
-        # 账号之间等待一段时间，避免请求过快
-        if i < len(accounts):
-            await asyncio.sleep(3)
+    results = []
+    async with session:
+        async for result in session.checkin_many(accounts, concurrency=concurrency, run_budget=run_budget):
+            results.append(result)
+            # 长时间运行时持续刷新缓存索引和指标文件
+            session.flush()
 
     # 打印汇总结果
-    print("\n" + "=" * 50)
-    print("签到汇总")
-    print("=" * 50)
+    echo("\n" + "=" * 50)
+    echo("签到汇总")
+    echo("=" * 50)
 
     success_count = sum(1 for r in results if r['success'])
     fail_count = len(results) - success_count
 
     for result in results:
-        status = "[OK] 成功" if result['success'] else "[FAIL] 失败"
+        status = STATUS_TEXT[result['status']]
         quota_text = f" - 余额: {result['quota_info']}" if result['quota_info'] else ""
-        print(f"  {result['name']}: {status}{quota_text}")
-
-    print(f"\n总计: {len(results)} 个账号")
-    print(f"  成功: {success_count}")
-    print(f"  失败: {fail_count}")
-    print("=" * 50)
+        network = result.get('network')
+        if network:
+            over = "（超出预算）" if network['over_budget'] else ""
+            quota_text += f" - 流量: {network['bytes'] / 1024:.0f} KB/{network['requests']} 请求{over}"
+        echo(f"  {result['name']}: {status}{quota_text}")
+
+    timeout_count = sum(1 for r in results if r['status'] == 'timeout')
+    deferred_count = sum(1 for r in results if r['status'] == 'deferred')
+    quarantined = [r for r in results if r.get('failure') == 'credentials']
+
+    echo(f"\n总计: {len(results)} 个账号")
+    echo(f"  成功: {success_count}")
+    echo(f"  失败: {fail_count}")
+    if timeout_count:
+        echo(f"  其中超时: {timeout_count}")
+    if deferred_count:
+        echo(f"  其中推迟: {deferred_count}")
+    if quarantined:
+        echo(f"  其中凭据错误已隔离: {len(quarantined)}")
+        for result in quarantined:
+            info = result.get('quarantine')
+            if info:
+                since = datetime.fromtimestamp(info['since']).strftime('%Y-%m-%d %H:%M')
+                echo(f"    - {result['name']}: {info['reason']}（自 {since}，{info['next_probe']} 后重新尝试）")
+            else:
+                echo(f"    - {result['name']}: {result['login_error']}（本次新加入）")
+    if asset_cache:
+        stats = asset_cache.stats()
+        echo(f"  静态资源缓存: 命中 {stats['hits']}/{stats['hits'] + stats['misses']} "
+             f"({stats['hit_rate']:.0%})，节省 {stats['bytes_served'] / 1024:.0f} KB，"
+             f"缓存 {stats['entries']} 个文件 {stats['total_bytes'] / 1024 / 1024:.1f} MB")
+    if profiles:
+        restored_count = sum(1 for r in results if r.get('session_restored'))
+        stats = profiles.stats()
+        echo(f"  浏览器配置: {restored_count} 个账号复用登录状态，"
+             f"共 {stats['profiles']} 个配置 {stats['total_bytes'] / 1024:.0f} KB")
+    print_network_summary(results, session.net_budget_kb)
+    echo("=" * 50)
+
+    metrics.run_duration.set(time.monotonic() - run_started)
+    metrics.last_run.set(time.time())
+    metrics.flush()
 
     # 全部成功时更新今日签到日期（已禁用，因为不再检查当日签到）
     all_success = (fail_count == 0)
@@ -798,15 +1661,24 @@ async def main_async():
     #     log("所有账号签到成功，更新今日签到记录")
     #     update_success_date()
 
-    # 发送邮件通知（失败不影响整体结果）
-    if success_count > 0:  # 只有成功的签到才发送邮件
-        try:
-            print("\n" + "=" * 50)
-            send_email(results)
-            print("=" * 50)
-        except Exception as e:
-            log(f"[WARN] 邮件发送失败: {str(e)}")
-            print("=" * 50)
+    # 发送邮件通知（失败不影响整体结果）；smtplib 是同步阻塞的，放到线程中执行
+    try:
+        echo("\n" + "=" * 50)
+        await asyncio.to_thread(notify, notifier, results)
+        echo("=" * 50)
+    except Exception as e:
+        log(f"[WARN] 邮件发送失败: {str(e)}")
+        echo("=" * 50)
+
+    if loop_monitor:
+        await loop_monitor.stop()
+        echo("\n" + "=" * 50)
+        loop_monitor.report(echo)
+        echo("=" * 50)
+        metrics.loop_max_lag.set(loop_monitor.max_lag)
+        metrics.flush()
+        if loop_monitor.exceeded():
+            all_success = False
 
     # 在事件循环关闭前触发垃圾回收，清理浏览器子进程的 transport，
     # 避免 asyncio.run() 关闭事件循环后 GC 触发 "Event loop is closed" 错误
@@ -815,8 +1687,34 @@ async def main_async():
     return all_success
 
 
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='Anyrouter 自动签到脚本')
+    parser.add_argument(
+        '--warmup', action='store_true',
+        help='仅检查 Camoufox 浏览器及指纹资源是否已下载，未就绪时返回非零退出码'
+    )
+    parser.add_argument(
+        '--startup-check', action='store_true',
+        help='仅检查脚本启动耗时（含模块导入），超出 STARTUP_BUDGET_MS 时返回非零退出码'
+    )
+    return parser.parse_args(argv)
+
+
 def main():
+    args = parse_args()
+    setup_logging(run_id=os.environ.get('GITHUB_RUN_ID') or datetime.now().strftime('%Y%m%d%H%M%S'))
+    if args.warmup:
+        ready = warmup()
+        shutdown_logging()
+        sys.exit(0 if ready else 1)
+    if args.startup_check:
+        within_budget = report_startup_time('startup-check')
+        shutdown_logging()
+        sys.exit(0 if within_budget else 1)
+
     success = asyncio.run(main_async())
+    shutdown_logging()
     sys.exit(0 if success else 1)
 
 
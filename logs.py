@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""分级、结构化、带缓冲的日志
+
+- LOG_LEVEL：DEBUG / INFO / WARNING / ERROR，默认 INFO；横幅和汇总等报告输出不受级别限制
+- LOG_FORMAT：text（默认）或 json（每行一个 JSON 对象）
+- 日志先进入队列，由后台线程写出，不阻塞事件循环
+- 通过 account_context() 为当前协程附加账号、站点字段，并发处理账号时可区分输出
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import contextvars
+import logging.handlers
+from datetime import datetime
+from contextlib import contextmanager
+
+logger = logging.getLogger('checkin')
+
+# 当前账号上下文（account、site），随协程和 asyncio 任务传递
+_context = contextvars.ContextVar('log_context', default={})
+
+# 运行级字段，setup_logging() 时确定
+_run_fields = {}
+
+_listener = None
+
+# 报告类输出（横幅、汇总）使用的级别，高于所有标准级别，不受 LOG_LEVEL 过滤
+REPORT = logging.CRITICAL + 10
+logging.addLevelName(REPORT, 'REPORT')
+
+# 沿用原有消息前缀推断级别，调用处无需逐一指定
+_PREFIX_LEVELS = (
+    ('[FAIL]', logging.ERROR),
+    ('[WARN]', logging.WARNING),
+)
+
+
+def log(message, level=None):
+    """记录日志；未指定级别时按 [FAIL] / [WARN] 前缀推断，默认 INFO"""
+    if level is None:
+        level = logging.INFO
+        for prefix, prefix_level in _PREFIX_LEVELS:
+            if message.startswith(prefix):
+                level = prefix_level
+                break
+    logger.log(level, message)
+
+
+def echo(text=''):
+    """输出报告类文本（横幅、汇总），文本模式下不加时间戳；任何 LOG_LEVEL 下都会输出"""
+    logger.log(REPORT, text, extra={'plain': True})
+
+
+def debug_enabled():
+    """DEBUG 级别是否开启，用于跳过只为调试输出而做的页面查询"""
+    return logger.isEnabledFor(logging.DEBUG)
+
+
+@contextmanager
+def account_context(**fields):
+    """在 with 块内为日志附加账号上下文字段"""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class _ContextFilter(logging.Filter):
+    def filter(self, record):
+        record.context = {**_run_fields, **_context.get()}
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """[时间] [账号] 消息；DEBUG 级别额外标注"""
+
+    def format(self, record):
+        message = record.getMessage()
+        if getattr(record, 'plain', False):
+            return message
+        timestamp = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S')
+        parts = [f"[{timestamp}]"]
+        if record.levelno == logging.DEBUG:
+            parts.append('[DEBUG]')
+        account = getattr(record, 'context', {}).get('account')
+        if account:
+            parts.append(f"[{account}]")
+        parts.append(message)
+        return ' '.join(parts)
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行 JSON，包含级别、消息以及运行/账号上下文"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'context', {}))
+        if getattr(record, 'plain', False):
+            entry['kind'] = 'report'
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _SafeStreamHandler(logging.StreamHandler):
+    """控制台编码不支持时替换无法编码的字符，而不是丢弃整行"""
+
+    def emit(self, record):
+        try:
+            msg = self.format(record)
+            try:
+                self.stream.write(msg + self.terminator)
+            except UnicodeEncodeError:
+                encoding = getattr(self.stream, 'encoding', None) or 'ascii'
+                msg = msg.replace('✓', '[OK]').replace('✗', '[FAIL]')
+                self.stream.write(msg.encode(encoding, 'replace').decode(encoding) + self.terminator)
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+
+def setup_logging(level=None, fmt=None, stream=None, **run_fields):
+    """初始化日志：队列缓冲 + 后台线程写出；重复调用会先关闭旧的写出线程"""
+    global _listener
+
+    level = (level or os.environ.get('LOG_LEVEL') or 'INFO').upper()
+    fmt = (fmt or os.environ.get('LOG_FORMAT') or 'text').lower()
+
+    shutdown_logging()
+    _run_fields.clear()
+    _run_fields.update(run_fields)
+
+    sink = _SafeStreamHandler(stream or sys.stdout)
+    sink.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # 上下文必须在调用线程中采集，因此过滤器挂在入队一侧
+    queue_handler.addFilter(_ContextFilter())
+
+    logger.handlers[:] = [queue_handler]
+    logger.setLevel(getattr(logging, level, logging.INFO))
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, sink)
+    _listener.start()
+    return logger
+
+
+def shutdown_logging():
+    """写出队列中剩余的日志并停止后台线程"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""事件循环延迟监控与阻塞调用检测
+
+并发处理账号时，任何同步阻塞调用（requests、smtplib、大文件读写等）都会让所有页面一起停顿。
+监控由两部分组成：
+- 心跳协程：每隔 interval 休眠一次，实际唤醒时间与预期的差值即为事件循环延迟
+- 看门狗线程：心跳超过阈值仍未唤醒时，抓取事件循环线程当前的调用栈和正在执行的任务，
+  即造成阻塞的代码位置
+
+LOOP_MONITOR=true 时启用，汇总中列出最严重的几次停顿；LOOP_LAG_FAIL_MS 设置后，
+最大延迟超过该值时以非零退出码结束，便于在本地基准测试中发现阻塞回归。
+"""
+
+import os
+import sys
+import time
+import heapq
+import asyncio
+import threading
+import traceback
+
+# 每次停顿保留的调用栈帧数（从最内层开始）
+STACK_DEPTH = 12
+
+# 调用栈中跳过的事件循环内部帧
+_INTERNAL_FILES = (os.sep + 'asyncio' + os.sep, os.sep + 'selectors.py')
+
+
+def _describe_task(task):
+    """任务名和协程的限定名"""
+    if task is None:
+        return None
+    coro = task.get_coro()
+    name = getattr(coro, '__qualname__', None) or repr(coro)
+    return f"{task.get_name()} ({name})"
+
+
+def _format_stack(frame):
+    """格式化调用栈，去掉 asyncio 内部帧"""
+    entries = [
+        entry for entry in traceback.extract_stack(frame)
+        if not any(part in entry.filename for part in _INTERNAL_FILES)
+    ]
+    return [
+        f"{entry.filename}:{entry.lineno} in {entry.name}" + (f": {entry.line}" if entry.line else '')
+        for entry in entries[-STACK_DEPTH:]
+    ]
+
+
+class LoopMonitor:
+    """事件循环延迟监控；需在事件循环中调用 start()，也可作为 async with 使用"""
+
+    def __init__(self, interval=0.05, threshold=0.1, fail_threshold=0.0, top=5):
+        self.interval = interval
+        self.threshold = threshold
+        self.fail_threshold = fail_threshold
+        self.top = top
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.stall_count = 0
+        self._stalls = []
+        self._seq = 0
+        self._loop = None
+        self._loop_thread = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+        # 心跳预期唤醒时间，由看门狗线程读取
+        self._deadline = None
+        self._captured = None
+
+    @classmethod
+    def from_env(cls):
+        """LOOP_MONITOR=true 时启用，未启用返回 None"""
+        if os.environ.get('LOOP_MONITOR', 'false').lower() != 'true':
+            return None
+        return cls(
+            threshold=float(os.environ.get('LOOP_LAG_THRESHOLD_MS') or '100') / 1000,
+            fail_threshold=float(os.environ.get('LOOP_LAG_FAIL_MS') or '0') / 1000,
+        )
+
+    def start(self):
+        """启动心跳协程和看门狗线程"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._task = self._loop.create_task(self._heartbeat(), name='loop-monitor')
+        self._thread = threading.Thread(target=self._watch, name='loop-monitor', daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        """停止监控"""
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            self._deadline = expected
+            await asyncio.sleep(self.interval)
+            self._record(time.perf_counter() - expected, expected)
+
+    def _watch(self):
+        # 看门狗的检查间隔小于阈值，保证停顿期间至少抓取一次调用栈
+        poll = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(poll):
+            deadline = self._deadline
+            if deadline is None or time.perf_counter() - deadline < self.threshold:
+                continue
+            if self._captured is not None and self._captured[0] == deadline:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            self._captured = (deadline, {
+                'task': _describe_task(asyncio.current_task(self._loop)),
+                'stack': _format_stack(frame),
+            })
+
+    def _record(self, lag, deadline):
+        lag = max(lag, 0.0)
+        self.samples += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        if lag < self.threshold:
+            return
+
+        self.stall_count += 1
+        captured = self._captured
+        stall = {'lag': lag, 'at': time.time(), 'task': None, 'stack': []}
+        if captured is not None and captured[0] == deadline:
+            stall.update(captured[1])
+        self._seq += 1
+        entry = (lag, self._seq, stall)
+        if len(self._stalls) < self.top:
+            heapq.heappush(self._stalls, entry)
+        else:
+            heapq.heappushpop(self._stalls, entry)
+
+    @property
+    def mean_lag(self):
+        return self.total_lag / self.samples if self.samples else 0.0
+
+    def worst_stalls(self):
+        """最严重的几次停顿，按延迟从大到小排列"""
+        return [stall for _, _, stall in sorted(self._stalls, key=lambda item: item[0], reverse=True)]
+
+    def exceeded(self):
+        """最大延迟是否超过失败阈值"""
+        return bool(self.fail_threshold) and self.max_lag > self.fail_threshold
+
+    def stats(self):
+        return {
+            'samples': self.samples,
+            'mean_lag': self.mean_lag,
+            'max_lag': self.max_lag,
+            'stalls': self.stall_count,
+            'worst': self.worst_stalls(),
+        }
+
+    def report(self, write):
+        """通过 write(line) 输出报告"""
+        write(f"  事件循环延迟: 平均 {self.mean_lag * 1000:.1f}ms，最大 {self.max_lag * 1000:.0f}ms，"
+              f"超过 {self.threshold * 1000:.0f}ms 的停顿 {self.stall_count} 次")
+        for stall in self.worst_stalls():
+            write(f"    - {stall['lag'] * 1000:.0f}ms 任务: {stall['task'] or '未知'}")
+            for line in stall['stack']:
+                write(f"        {line}")
+        if self.exceeded():
+            write(f"  [FAIL] 事件循环最大延迟超过 {self.fail_threshold * 1000:.0f}ms")
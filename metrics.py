@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""签到运行指标，以 Prometheus 文本格式（0.0.4）写入文件
+
+配合 node_exporter 的 textfile collector 采集：
+    METRICS_FILE=/var/lib/node_exporter/textfile/checkin.prom
+
+textfile collector 只解析 0.0.4 格式，TYPE/HELP 行必须使用与样本相同的名称：
+counter 的指标族名即带 _total 后缀的样本名，histogram 的 _bucket/_count/_sum 样本归属于不带后缀的指标族。
+"""
+
+import os
+import math
+from urllib.parse import urlparse
+
+from statefile import write_atomic
+
+# 各阶段耗时（秒）的直方图桶
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return '{' + pairs + '}'
+
+
+class _Metric:
+    type_name = 'unknown'
+
+    def __init__(self, name, documentation, labelnames=()):
+        # 指标基础名，counter 的样本名另加 _total 后缀
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    @property
+    def family_name(self):
+        """TYPE/HELP 行使用的指标族名"""
+        return self.name
+
+    def samples(self):
+        """返回 (后缀, 标签, 值) 列表，后缀接在指标族名之后"""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [
+            f"# HELP {self.family_name} {_escape(self.documentation)}",
+            f"# TYPE {self.family_name} {self.type_name}",
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.family_name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def set_total(self, value, **labels):
+        """同步外部维护的累计值（如 AssetCache 的命中数）"""
+        self._values[self._key(labels)] = value
+
+    @property
+    def family_name(self):
+        return f"{self.name}_total"
+
+    def samples(self):
+        return [('', key, value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def samples(self):
+        return [('', key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state['counts'][i] += 1
+        state['sum'] += value
+        state['count'] += 1
+
+    def samples(self):
+        result = []
+        for key, state in sorted(self._values.items()):
+            for bound, count in zip(self.buckets, state['counts']):
+                le = '+Inf' if math.isinf(bound) else _format_value(float(bound))
+                result.append(('_bucket', key + (('le', le),), count))
+            result.append(('_count', key, state['count']))
+            result.append(('_sum', key, state['sum']))
+        return result
+
+
+class MetricsRegistry:
+    """指标集合，负责渲染与写文件"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """渲染为 Prometheus 文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """原子写入文件，避免采集器读到半个文件"""
+        write_atomic(path, self.render())
+
+
+class CheckinMetrics(MetricsRegistry):
+    """签到脚本使用的全部指标"""
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path
+        self.accounts = self.counter(
+            'checkin_accounts', '按结果统计的账号数', ('site', 'result'))
+        self.failures = self.counter(
+            'checkin_failures', '按失败类型统计的账号数', ('site', 'class'))
+        self.skipped = self.counter(
+            'checkin_accounts_skipped', '未执行登录而跳过的账号数', ('site', 'reason'))
+        self.login_seconds = self.histogram(
+            'checkin_login_duration_seconds', '登录耗时（含重试）', ('site',))
+        self.sign_in_seconds = self.histogram(
+            'checkin_sign_in_duration_seconds', '签到接口耗时', ('site',))
+        self.user_info_seconds = self.histogram(
+            'checkin_user_info_duration_seconds', '用户信息接口耗时', ('site',))
+        self.browser_launch_seconds = self.histogram(
+            'checkin_browser_launch_duration_seconds', '浏览器启动耗时')
+        self.network_bytes = self.counter(
+            'checkin_network_bytes', '页面网络传输字节数', ('site', 'type'))
+        self.network_requests = self.counter(
+            'checkin_network_requests', '页面网络请求数', ('site', 'type'))
+        self.asset_cache_requests = self.counter(
+            'checkin_asset_cache_requests', '静态资源缓存请求数', ('result',))
+        self.loop_max_lag = self.gauge(
+            'checkin_event_loop_max_lag_seconds', '事件循环最大延迟（启用 LOOP_MONITOR 时）')
+        self.run_duration = self.gauge(
+            'checkin_run_duration_seconds', '本次运行总耗时')
+        self.last_run = self.gauge(
+            'checkin_last_run_timestamp_seconds', '最近一次运行完成的 Unix 时间戳')
+
+    @classmethod
+    def from_env(cls):
+        """METRICS_FILE 未设置时仍然收集指标，只是不写文件"""
+        return cls(os.environ.get('METRICS_FILE') or None)
+
+    def site(self, url):
+        """站点标签：取 URL 的主机名"""
+        return urlparse(url).netloc or url
+
+    def flush(self):
+        """写入指标文件（未配置路径时忽略）"""
+        if self.path:
+            self.write(self.path)
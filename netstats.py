@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""单个账号的网络流量统计
+
+监听页面的 requestfinished / requestfailed 事件，按资源类型和主机统计请求数、
+传输字节数（请求头 + 请求体 + 响应头 + 编码后的响应体）和请求耗时。
+由 AssetCache 从磁盘返回的响应记为缓存命中，不计入传输字节数。
+"""
+
+import asyncio
+from urllib.parse import urlparse
+
+
+def _bucket():
+    return {'requests': 0, 'bytes': 0, 'time_ms': 0.0}
+
+
+class NetworkAccounting:
+    """页面级流量统计"""
+
+    def __init__(self):
+        self.requests = 0
+        self.failed = 0
+        self.cached = 0
+        self.bytes = 0
+        self.time_ms = 0.0
+        self.by_type = {}
+        self.by_host = {}
+        self._cached_urls = set()
+        self._tasks = set()
+
+    def attach(self, page):
+        """在页面上注册事件监听"""
+        page.on('requestfinished', self._on_finished)
+        page.on('requestfailed', self._on_failed)
+
+    def mark_cached(self, url):
+        """AssetCache 命中时调用，该请求不计入传输字节数"""
+        self._cached_urls.add(url)
+
+    def _on_finished(self, request):
+        # sizes() 需要与浏览器往返一次，放到后台任务中执行，结束前由 drain() 等待
+        task = asyncio.ensure_future(self._record(request))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_failed(self, request):
+        self.failed += 1
+        self._add(request, 0, 0.0)
+
+    async def _record(self, request):
+        if request.url in self._cached_urls:
+            self.cached += 1
+            self._add(request, 0, 0.0)
+            return
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            sizes = {}
+        transferred = sum(max(sizes.get(key, 0), 0) for key in (
+            'requestHeadersSize', 'requestBodySize', 'responseHeadersSize', 'responseBodySize'))
+        timing = request.timing or {}
+        elapsed = max(timing.get('responseEnd', -1), 0.0)
+        self._add(request, transferred, elapsed)
+
+    def _add(self, request, transferred, elapsed):
+        self.requests += 1
+        self.bytes += transferred
+        self.time_ms += elapsed
+        for table, key in ((self.by_type, request.resource_type), (self.by_host, urlparse(request.url).netloc)):
+            bucket = table.setdefault(key or 'other', _bucket())
+            bucket['requests'] += 1
+            bucket['bytes'] += transferred
+            bucket['time_ms'] += elapsed
+
+    async def drain(self, timeout=5):
+        """等待尚未完成的统计任务，页面关闭前调用"""
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=timeout)
+
+    def summary(self, budget_bytes=0):
+        """统计结果；budget_bytes > 0 时标记是否超出预算"""
+        return {
+            'requests': self.requests,
+            'failed': self.failed,
+            'cached': self.cached,
+            'bytes': self.bytes,
+            'time_ms': round(self.time_ms, 1),
+            'by_type': self.by_type,
+            'by_host': self.by_host,
+            'over_budget': bool(budget_bytes) and self.bytes > budget_bytes,
+        }
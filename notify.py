@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""签到结果邮件通知的内容生成
+
+- full：每次运行发送全部账号的结果（原有行为）
+- digest：与上次运行的状态对比，只在出现新增失败、恢复成功或余额变化时发送变化部分
+- daily：每次运行只累计当天的结果，新的一天首次运行时发送前一天的汇总
+
+状态保存在 STATE_DIR/notify.json 中；邮件发送失败时，下次运行会重新报告这些变化。
+"""
+
+import io
+import os
+import csv
+import html
+from datetime import datetime
+
+from statefile import state_path, write_json, read_json
+
+NOTIFY_MODES = ('full', 'digest', 'daily')
+
+# 日报中保留的变化记录条数上限，避免状态文件无限增长
+MAX_DAILY_CHANGES = 500
+
+# 不代表账号状态的结果（未实际执行签到），不参与对比
+UNCHANGED_STATUSES = ('deferred',)
+
+CHANGE_TEXT = {
+    'failed': '新增失败',
+    'recovered': '恢复成功',
+    'quota': '余额变化',
+}
+
+EMAIL_STYLE = """
+    <style>
+        body { font-family: Arial, sans-serif; }
+        .summary { background-color: #f0f0f0; padding: 15px; border-radius: 5px; margin: 10px 0; }
+        .success { color: #28a745; }
+        .fail { color: #dc3545; }
+        table { border-collapse: collapse; width: 100%; margin: 20px 0; }
+        th, td { border: 1px solid #ddd; padding: 12px; text-align: left; }
+        th { background-color: #4CAF50; color: white; }
+        tr:nth-child(even) { background-color: #f2f2f2; }
+    </style>
+"""
+
+FOOTER = """
+    <hr>
+    <p style="color: #666; font-size: 12px;">
+        此邮件由 Anyrouter 自动签到脚本自动发送
+    </p>
+"""
+
+
+def account_key(result):
+    """状态文件中的账号键：站点 + 账号名"""
+    return f"{result.get('url') or ''}|{result['name']}"
+
+
+def quota_value(result):
+    """结果中的余额数值，未获取到时返回 None"""
+    user_info = result.get('user_info') or {}
+    try:
+        return float(user_info['quota'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _cell(value, css_class=None):
+    text = html.escape('' if value is None else str(value))
+    if css_class:
+        return f'<td class="{css_class}">{text}</td>'
+    return f'<td>{text}</td>'
+
+
+def _table(headers, rows):
+    """rows 中每一项为已生成的 <td> 列表"""
+    parts = ['<table><tr>']
+    parts.extend(f'<th>{html.escape(h)}</th>' for h in headers)
+    parts.append('</tr>')
+    for row in rows:
+        parts.append('<tr>')
+        parts.extend(row)
+        parts.append('</tr>')
+    parts.append('</table>')
+    return ''.join(parts)
+
+
+def _document(title, summary_lines, sections):
+    """组装完整的 HTML 邮件；summary_lines 为 (css_class, 标签, 值)"""
+    parts = ['<html><head>', EMAIL_STYLE, '</head><body>', f'<h2>{html.escape(title)}</h2>',
+             '<div class="summary">']
+    for css_class, label, value in summary_lines:
+        attr = f' class="{css_class}"' if css_class else ''
+        parts.append(f'<p{attr}><strong>{html.escape(label)}：</strong>{html.escape(str(value))}</p>')
+    parts.append('</div>')
+    for heading, body in sections:
+        parts.append(f'<h3>{html.escape(heading)}</h3>')
+        parts.append(body)
+    parts.append(FOOTER)
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def _format_quota(value):
+    return '' if value is None else f"${value:g}"
+
+
+def _format_delta(old, new):
+    if old is None or new is None or old == new:
+        return ''
+    return f"{new - old:+g}"
+
+
+def results_csv(results, status_text):
+    """全部结果的 CSV（带 BOM，便于 Excel 直接打开）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['账号', '网址', '状态', '余额', '失败类型', '登录错误', '耗时(秒)'])
+    for result in results:
+        writer.writerow([
+            result['name'],
+            result.get('url') or '',
+            status_text[result['status']].split()[-1],
+            result.get('quota_info', ''),
+            result.get('failure') or '',
+            result.get('login_error') or '',
+            result.get('elapsed', ''),
+        ])
+    return ('\ufeff' + buffer.getvalue()).encode('utf-8')
+
+
+def rollup_csv(rollup):
+    """日报中各账号累计结果的 CSV"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['账号', '网址', '运行次数', '成功次数', '最后状态', '日初余额', '日末余额'])
+    for key, entry in sorted(rollup['accounts'].items()):
+        writer.writerow([
+            entry['name'],
+            key.rsplit('|', 1)[0],
+            entry['runs'],
+            entry['success'],
+            entry['status'],
+            _format_quota(entry.get('quota_start')),
+            _format_quota(entry.get('quota')),
+        ])
+    return ('\ufeff' + buffer.getvalue()).encode('utf-8')
+
+
+class Notifier:
+    """根据通知模式生成邮件，并维护跨运行的对比状态"""
+
+    def __init__(self, mode, status_text, path=None, attach_csv=False, quota_delta=0.0):
+        self.mode = mode
+        self.status_text = status_text
+        self.path = path
+        self.attach_csv = attach_csv
+        self.quota_delta = quota_delta
+        self._state = self._load() if path else {}
+
+    @classmethod
+    def from_env(cls, status_text):
+        """NOTIFY_MODE / NOTIFY_CSV / NOTIFY_QUOTA_DELTA / STATE_DIR"""
+        mode = (os.environ.get('NOTIFY_MODE') or 'full').lower()
+        if mode not in NOTIFY_MODES:
+            raise ValueError(f"NOTIFY_MODE 只能是 {' / '.join(NOTIFY_MODES)}，当前为 {mode}")
+        return cls(
+            mode,
+            status_text,
+            path=state_path('notify.json') if mode != 'full' else None,
+            attach_csv=os.environ.get('NOTIFY_CSV', 'false').lower() == 'true',
+            quota_delta=float(os.environ.get('NOTIFY_QUOTA_DELTA') or '0'),
+        )
+
+    def _load(self):
+        return read_json(self.path) or {}
+
+    def save(self):
+        """原子写入通知状态；full 模式不保存状态"""
+        if self.path:
+            write_json(self.path, self._state)
+
+    def _label(self, status):
+        return self.status_text[status].split()[-1]
+
+    def diff(self, results):
+        """与上次运行对比，返回变化列表并更新内存中的账号快照"""
+        accounts = self._state.setdefault('accounts', {})
+        changes = []
+        for result in results:
+            if result['status'] in UNCHANGED_STATUSES:
+                continue
+            key = account_key(result)
+            previous = accounts.get(key) or {}
+            quota = quota_value(result)
+            if quota is None:
+                # 未获取到余额时沿用上次的值，避免下次误报余额变化
+                quota = previous.get('quota')
+            change = {'kind': None, 'name': result['name'], 'status': result['status']}
+
+            was_success = previous.get('status') == 'success'
+            if result['success'] and previous and not was_success:
+                change['kind'] = 'recovered'
+                change['detail'] = f"此前: {self._label(previous['status'])}"
+            elif not result['success'] and (not previous or was_success):
+                change['kind'] = 'failed'
+                change['detail'] = result.get('login_error') or result.get('failure') or ''
+            elif (quota is not None and previous.get('quota') is not None
+                  and abs(quota - previous['quota']) > self.quota_delta):
+                change['kind'] = 'quota'
+            if change['kind']:
+                change.update(old_quota=previous.get('quota'), quota=quota)
+                changes.append(change)
+
+            accounts[key] = {'name': result['name'], 'status': result['status'], 'quota': quota}
+
+        # 清理已从配置中删除的账号
+        current = {account_key(result) for result in results}
+        for key in [key for key in accounts if key not in current]:
+            del accounts[key]
+        return changes
+
+    def _change_rows(self, changes, with_time=False):
+        rows = []
+        for change in changes:
+            css_class = 'fail' if change['kind'] == 'failed' else 'success'
+            row = [
+                _cell(change['name']),
+                _cell(CHANGE_TEXT[change['kind']], css_class),
+                _cell(self._label(change['status'])),
+                _cell(_format_quota(change.get('quota'))),
+                _cell(_format_delta(change.get('old_quota'), change.get('quota'))),
+                _cell(change.get('detail', '')),
+            ]
+            if with_time:
+                row.insert(0, _cell(change.get('time', '')))
+            rows.append(row)
+        return rows
+
+    def _render_full(self, results, now):
+        success_count = sum(1 for r in results if r['success'])
+        rows = []
+        for result in results:
+            success = result['success']
+            rows.append([
+                _cell(result['name']),
+                _cell(('✓ ' if success else '✗ ') + self._label(result['status']),
+                      'success' if success else 'fail'),
+                _cell(result.get('quota_info', '')),
+            ])
+        return _document('Anyrouter 自动签到报告', [
+            (None, '执行时间', now),
+            (None, '总计账号', f"{len(results)} 个"),
+            ('success', '✓ 成功', f"{success_count} 个"),
+            ('fail', '✗ 失败', f"{len(results) - success_count} 个"),
+        ], [('详细结果', _table(['账号名称', '签到结果', '账户余额'], rows))])
+
+    def _render_digest(self, results, changes, now):
+        success_count = sum(1 for r in results if r['success'])
+        counts = {kind: sum(1 for c in changes if c['kind'] == kind) for kind in CHANGE_TEXT}
+        summary = [
+            (None, '执行时间', now),
+            (None, '总计账号', f"{len(results)} 个（成功 {success_count}，失败 {len(results) - success_count}）"),
+        ]
+        summary.extend(
+            ('fail' if kind == 'failed' else 'success', CHANGE_TEXT[kind], f"{count} 个")
+            for kind, count in counts.items() if count
+        )
+        table = _table(['账号名称', '变化', '当前状态', '账户余额', '余额变化', '说明'],
+                       self._change_rows(changes))
+        return _document('Anyrouter 签到变化', summary, [('变化明细', table)])
+
+    def _accumulate(self, results, changes, now):
+        """累计到当天的日报中；日期变化时把前一天的日报移入待发送"""
+        today = now[:10]
+        daily = self._state.get('daily')
+        if daily and daily['day'] != today:
+            self._state['pending'] = daily
+            daily = None
+        if not daily:
+            daily = self._state['daily'] = {'day': today, 'runs': 0, 'accounts': {}, 'changes': []}
+
+        daily['runs'] += 1
+        for result in results:
+            if result['status'] in UNCHANGED_STATUSES:
+                continue
+            key = account_key(result)
+            entry = daily['accounts'].setdefault(key, {
+                'name': result['name'], 'runs': 0, 'success': 0, 'quota_start': quota_value(result)})
+            entry['runs'] += 1
+            entry['success'] += 1 if result['success'] else 0
+            entry['status'] = self._label(result['status'])
+            entry['failed'] = not result['success']
+            quota = quota_value(result)
+            if quota is not None:
+                entry['quota'] = quota
+                if entry.get('quota_start') is None:
+                    entry['quota_start'] = quota
+        for change in changes:
+            daily['changes'].append({**change, 'time': now[11:16]})
+        del daily['changes'][:-MAX_DAILY_CHANGES]
+
+    def _render_daily(self, rollup):
+        accounts = rollup['accounts']
+        failing = [entry for entry in accounts.values() if entry.get('failed')]
+        runs = sum(entry['runs'] for entry in accounts.values())
+        successes = sum(entry['success'] for entry in accounts.values())
+        summary = [
+            (None, '日期', rollup['day']),
+            (None, '运行次数', f"{rollup['runs']} 次"),
+            (None, '总计账号', f"{len(accounts)} 个"),
+            ('success', '✓ 签到成功', f"{successes}/{runs} 次"),
+            ('fail', '✗ 当前失败账号', f"{len(failing)} 个"),
+        ]
+        sections = []
+        if rollup['changes']:
+            sections.append(('当日变化', _table(
+                ['时间', '账号名称', '变化', '当前状态', '账户余额', '余额变化', '说明'],
+                self._change_rows(rollup['changes'], with_time=True))))
+        if failing:
+            rows = [[_cell(entry['name']), _cell(entry['status'], 'fail'),
+                     _cell(f"{entry['success']}/{entry['runs']}"),
+                     _cell(_format_quota(entry.get('quota')))] for entry in failing]
+            sections.append(('当前失败账号', _table(['账号名称', '最后状态', '成功/运行', '账户余额'], rows)))
+        return _document(f"Anyrouter 签到日报 {rollup['day']}", summary, sections)
+
+    def prepare(self, results, now=None):
+        """生成本次需要发送的邮件列表 [(subject, html_body, attachments)]，可能为空
+
+        attachments 为 [(文件名, bytes, MIME 子类型)]。状态只在内存中更新，
+        发送完成后调用 finish() 写入。
+        """
+        now = (now or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+        attachments = [('results.csv', results_csv(results, self.status_text), 'csv')] if self.attach_csv else []
+
+        if self.mode == 'full':
+            # 原有行为：只要有账号签到成功就发送完整报告
+            if not any(r['success'] for r in results):
+                return []
+            return [(f"Anyrouter 签到报告 - {now}", self._render_full(results, now), attachments)]
+
+        changes = self.diff(results)
+        if self.mode == 'digest':
+            if not changes:
+                return []
+            return [(f"Anyrouter 签到变化（{len(changes)} 项）- {now}",
+                     self._render_digest(results, changes, now), attachments)]
+
+        self._accumulate(results, changes, now)
+        rollup = self._state.get('pending')
+        if not rollup:
+            return []
+        attachments = [(f"rollup-{rollup['day']}.csv", rollup_csv(rollup), 'csv')] if self.attach_csv else []
+        return [(f"Anyrouter 签到日报 - {rollup['day']}", self._render_daily(rollup), attachments)]
+
+    def finish(self, delivered):
+        """发送结束后保存状态
+
+        delivered 为 False 表示邮件发送失败：digest 模式保留旧快照，下次运行重新报告这些变化；
+        daily 模式保留待发送的日报，下次运行重新发送。
+        """
+        if delivered:
+            self._state.pop('pending', None)
+        elif self.mode == 'digest':
+            return
+        self.save()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""每个账号的持久化浏览器配置
+
+每个账号在 PROFILE_DIR 下有独立目录：
+- state.json：登录后的 Cookie 与 localStorage（Playwright storage_state），下次运行恢复，
+  登录状态仍有效时直接跳过登录表单
+- fingerprint.json：首次生成后固定使用的 Camoufox 指纹配置，网站每次看到的是同一台设备
+- profile.json：账号名与最后使用时间
+
+目录以网址 + 用户名的哈希命名，不保存密码；已从配置中删除的账号的目录会被清理。
+"""
+
+import os
+import json
+import time
+import random
+import shutil
+import hashlib
+
+from statefile import write_atomic, write_json, read_json
+
+STATE_FILE = 'state.json'
+FINGERPRINT_FILE = 'fingerprint.json'
+META_FILE = 'profile.json'
+
+# 登录状态超出容量时只保留的 localStorage 项
+KEPT_STORAGE_KEYS = ('user',)
+
+FINGERPRINT_OS = ('windows', 'macos', 'linux')
+
+
+def profile_key(account, default_base_url):
+    """账号目录名：网址 + 用户名的哈希（修改密码不会丢失登录状态）"""
+    identity = f"{account.get('url') or default_base_url}|{account['email']}"
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()[:32]
+
+
+def generate_fingerprint_config():
+    """生成一份 Camoufox 指纹配置，返回 (os, config)；Camoufox 不可用时返回 None"""
+    try:
+        from camoufox.fingerprints import generate_fingerprint, from_browserforge
+    except ImportError:
+        return None
+    target_os = random.choice(FINGERPRINT_OS)
+    config = from_browserforge(generate_fingerprint(os=target_os))
+    return target_os, config
+
+
+class BrowserProfile:
+    """单个账号的配置目录"""
+
+    def __init__(self, path, name, max_bytes):
+        self.path = path
+        self.name = name
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    @property
+    def state_path(self):
+        return os.path.join(self.path, STATE_FILE)
+
+    def storage_state(self):
+        """已保存的登录状态文件路径，不存在时返回 None"""
+        return self.state_path if os.path.exists(self.state_path) else None
+
+    def launch_options(self):
+        """固定指纹对应的 AsyncCamoufox 启动参数；首次调用时生成并保存"""
+        path = os.path.join(self.path, FINGERPRINT_FILE)
+        saved = read_json(path)
+        if not saved:
+            generated = generate_fingerprint_config()
+            if generated is None:
+                return {}
+            saved = {'os': generated[0], 'config': generated[1]}
+            write_json(path, saved)
+        # config 中已包含完整的 navigator/screen 指纹，Camoufox 会对自定义指纹给出警告
+        return {'os': saved['os'], 'config': saved['config'], 'i_know_what_im_doing': True}
+
+    async def save_state(self, context):
+        """保存浏览器上下文的 Cookie 与 localStorage，超出容量时只保留登录所需的项"""
+        state = await context.storage_state()
+        data = json.dumps(state, ensure_ascii=False)
+        if len(data.encode('utf-8')) > self.max_bytes:
+            for origin in state.get('origins', []):
+                origin['localStorage'] = [
+                    item for item in origin.get('localStorage', [])
+                    if item.get('name') in KEPT_STORAGE_KEYS
+                ]
+            data = json.dumps(state, ensure_ascii=False)
+        if len(data.encode('utf-8')) > self.max_bytes:
+            self.clear_state()
+            return False
+        write_atomic(self.state_path, data)
+        write_json(os.path.join(self.path, META_FILE), {'name': self.name, 'last_used': time.time()})
+        return True
+
+    def clear_state(self):
+        """删除失效的登录状态（保留指纹）"""
+        try:
+            os.remove(self.state_path)
+        except OSError:
+            pass
+
+    def size(self):
+        return sum(
+            os.path.getsize(os.path.join(self.path, name))
+            for name in os.listdir(self.path)
+            if os.path.isfile(os.path.join(self.path, name))
+        )
+
+
+class ProfileStore:
+    """所有账号配置目录的根目录"""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """根据 PROFILE_DIR / PROFILE_MAX_KB 创建，未配置目录时返回 None"""
+        root = os.environ.get('PROFILE_DIR')
+        if not root:
+            return None
+        max_kb = float(os.environ.get('PROFILE_MAX_KB') or '512')
+        return cls(root, int(max_kb * 1024))
+
+    def get(self, account, default_base_url):
+        """账号对应的配置目录，不存在时创建"""
+        key = profile_key(account, default_base_url)
+        return BrowserProfile(os.path.join(self.root, key), account['name'], self.max_bytes)
+
+    def prune(self, keys):
+        """删除不在当前账号列表中的配置目录（账号已删除或网址、用户名已修改）"""
+        keys = set(keys)
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name not in keys and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def stats(self):
+        """配置目录数量与总大小"""
+        profiles = [
+            BrowserProfile(os.path.join(self.root, name), None, self.max_bytes)
+            for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name))
+        ]
+        return {'profiles': len(profiles), 'total_bytes': sum(p.size() for p in profiles)}
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""凭据错误账号隔离
+
+登录时页面明确提示账号或密码错误的账号会被记录下来，后续运行直接跳过，
+直到账号配置（网址、用户名、密码）发生变化，或距上次失败超过重新探测间隔。
+
+记录以网址 + 用户名的哈希为键；密码只保存加盐的 scrypt 指纹，用于判断密码是否已修改。
+该文件会随 Actions 缓存保存，快速哈希可以被离线字典攻击还原出弱密码，因此不使用 SHA-256 等快速哈希。
+"""
+
+import os
+import hmac
+import json
+import time
+import hashlib
+
+from statefile import state_path, write_json, read_json
+
+# scrypt 参数：单次计算约 50ms、16MB 内存
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+
+
+def account_key(account, default_base_url):
+    """隔离记录的键：网址 + 用户名的哈希（不含密码）"""
+    identity = json.dumps({'url': account.get('url') or default_base_url, 'email': account['email']}, sort_keys=True)
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def password_fingerprint(password, salt=None):
+    """密码的加盐 scrypt 指纹，返回 {'salt', 'hash'}（十六进制）"""
+    salt = salt if salt is not None else os.urandom(SALT_BYTES)
+    digest = hashlib.scrypt(password.encode('utf-8'), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=32)
+    return {'salt': salt.hex(), 'hash': digest.hex()}
+
+
+def password_matches(fingerprint, password):
+    """密码与保存的指纹是否一致"""
+    if not isinstance(fingerprint, dict) or 'salt' not in fingerprint or 'hash' not in fingerprint:
+        return False
+    expected = password_fingerprint(password, bytes.fromhex(fingerprint['salt']))['hash']
+    return hmac.compare_digest(expected, fingerprint['hash'])
+
+
+class CredentialQuarantine:
+    """以 JSON 文件保存的隔离名单"""
+
+    def __init__(self, path, reprobe_seconds):
+        self.path = path
+        self.reprobe_seconds = reprobe_seconds
+        self._entries = self._load()
+
+    @classmethod
+    def from_env(cls):
+        """QUARANTINE_REPROBE_HOURS=0 时禁用，返回 None"""
+        reprobe_hours = float(os.environ.get('QUARANTINE_REPROBE_HOURS') or '24')
+        if reprobe_hours <= 0:
+            return None
+        return cls(state_path('quarantine.json'), reprobe_hours * 3600)
+
+    def _load(self):
+        return read_json(self.path) or {}
+
+    def save(self):
+        """原子写入隔离名单"""
+        write_json(self.path, self._entries, indent=2)
+
+    def prune(self, keys):
+        """移除不在当前账号列表中的记录（账号已删除或网址、用户名已修改）"""
+        keys = set(keys)
+        removed = [key for key in self._entries if key not in keys]
+        for key in removed:
+            del self._entries[key]
+        return len(removed)
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def is_quarantined(self, key, password, now=None):
+        """在隔离期内返回 True；密码已修改或超过重新探测间隔后允许再尝试一次登录
+
+        先检查重新探测间隔，仍在隔离期内时才计算密码指纹；scrypt 较慢，异步代码中应放到线程中调用。
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        now = now if now is not None else time.time()
+        if now - entry['last_failure'] >= self.reprobe_seconds:
+            return False
+        return password_matches(entry.get('password'), password)
+
+    def next_probe(self, key):
+        """下次允许重新探测的时间戳"""
+        entry = self._entries.get(key)
+        return entry['last_failure'] + self.reprobe_seconds if entry else None
+
+    def add(self, key, name, reason, password, now=None):
+        """记录一次凭据错误；密码与已有记录不同时重新开始计数
+
+        需要计算密码指纹，异步代码中应放到线程中调用；记录整体替换，读取方不会看到写了一半的记录。
+        """
+        now = now if now is not None else time.time()
+        entry = self._entries.get(key)
+        if entry is None or not password_matches(entry.get('password'), password):
+            entry = {'since': now, 'failures': 0, 'password': password_fingerprint(password)}
+        self._entries[key] = {**entry, 'name': name, 'reason': reason, 'last_failure': now,
+                              'failures': entry['failures'] + 1}
+
+    def release(self, key):
+        """登录成功后解除隔离"""
+        return self._entries.pop(key, None) is not None
+
+    def entries(self):
+        return dict(self._entries)
@@ -0,0 +1,63 @@
+// 离线基准测试用：模拟登录页的交互（公告弹窗、切换邮箱登录、提交登录、错误提示）
+(function () {
+    var FORM_HTML =
+        '<div class="semi-form" id="email-form">' +
+        '<div class="semi-form-field"><label for="username">用户名或邮箱</label>' +
+        '<input id="username" type="text" placeholder="请输入您的用户名或邮箱地址"></div>' +
+        '<div class="semi-form-field"><label for="password">密码</label>' +
+        '<input id="password" type="password" placeholder="请输入您的密码"></div>' +
+        '<button type="button" class="semi-button semi-button-primary" id="login-submit">' +
+        '<span class="semi-button-content">继续</span></button>' +
+        '</div>';
+
+    function showForm() {
+        if (document.getElementById('username')) return;
+        document.getElementById('login-area').insertAdjacentHTML('beforeend', FORM_HTML);
+    }
+
+    function toast(message) {
+        var old = document.querySelector('.semi-toast-wrapper');
+        if (old) old.remove();
+        document.body.insertAdjacentHTML('beforeend',
+            '<div class="semi-toast-wrapper"><div class="semi-toast semi-toast-error" role="alert">' +
+            '<span class="semi-toast-content-text"></span></div></div>');
+        document.querySelector('.semi-toast-content-text').textContent = message;
+    }
+
+    function submit() {
+        var body = JSON.stringify({
+            username: document.getElementById('username').value,
+            password: document.getElementById('password').value
+        });
+        fetch('/api/user/login?turnstile=', {method: 'POST', body: body})
+            .then(function (res) { return res.json(); })
+            .then(function (data) {
+                if (data.success) {
+                    localStorage.setItem('user', JSON.stringify(data.data));
+                    location.href = '/console';
+                } else {
+                    toast(data.message || '登录失败');
+                }
+            })
+            .catch(function () { toast('网络错误'); });
+    }
+
+    document.addEventListener('click', function (event) {
+        var toggle = event.target.closest('[data-email-toggle]');
+        if (toggle) {
+            toggle.remove();
+            // 真实页面切换后有短暂的过渡动画
+            setTimeout(showForm, 150);
+            return;
+        }
+        if (event.target.closest('#login-submit')) submit();
+    });
+
+    document.addEventListener('keydown', function (event) {
+        if (event.key !== 'Escape') return;
+        var modal = document.querySelector('.semi-modal-wrap');
+        if (modal) modal.remove();
+    });
+
+    if (document.body.dataset.emailMode === 'true') showForm();
+})();
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""状态文件的读写
+
+指标、静态资源缓存索引、隔离名单、通知状态和浏览器配置都通过这里写入：
+先写临时文件再 os.replace，进程中途退出或其他程序同时读取时不会看到写了一半的文件。
+"""
+
+import os
+import json
+
+# 跨运行保存状态（隔离名单、通知对比状态等）的默认目录
+DEFAULT_STATE_DIR = '.checkin_state'
+
+
+def state_path(name):
+    """STATE_DIR（默认 .checkin_state）下的状态文件路径"""
+    return os.path.join(os.environ.get('STATE_DIR') or DEFAULT_STATE_DIR, name)
+
+
+def write_atomic(path, data):
+    """原子写入文本或字节，父目录不存在时创建"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    if isinstance(data, bytes):
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+    else:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_json(path, data, indent=None):
+    """原子写入 JSON"""
+    write_atomic(path, json.dumps(data, ensure_ascii=False, indent=indent))
+
+
+def read_json(path, expected=dict):
+    """读取 JSON；文件不存在、内容损坏或类型不是 expected 时返回 None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if expected is None or isinstance(data, expected) else None